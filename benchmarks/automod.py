@@ -0,0 +1,69 @@
+"""Replay a synthetic message stream through the automod `SpamTracker`.
+
+Reports the per-message overhead and the memory used per tracked member. Run with
+`python -m benchmarks.automod [messages] [members]` from the repository root.
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from bot import constants
+from bot.utils.automod import RateLimit, SpamLimits, SpamTracker
+
+GUILDS = 50
+WORDS = ("hello", "lol", "anyone here?", "gg", "free nitro", "@everyone look", "ok", "brb")
+
+
+def make_tracker() -> SpamTracker:
+    return SpamTracker(
+        SpamLimits(
+            messages=RateLimit.parse(constants.AUTOMOD_MESSAGE_RATE),
+            duplicates=RateLimit.parse(constants.AUTOMOD_DUPLICATE_RATE),
+            mentions=RateLimit.parse(constants.AUTOMOD_MENTION_RATE),
+        )
+    )
+
+
+def make_stream(messages: int, members: int) -> list:
+    """Messages spread over an hour, with a few spammers mixed in."""
+    rng = random.Random(0)
+    spammers = set(rng.sample(range(members), max(1, members // 100)))
+    stream = []
+    now = 0.0
+    for _ in range(messages):
+        now += 3600 / messages
+        user = rng.randrange(members)
+        if user in spammers:
+            content, mentions = "buy my stuff", rng.choice((0, 5))
+        else:
+            content, mentions = rng.choice(WORDS), int(rng.random() < 0.05)
+        stream.append((user % GUILDS, user, content, mentions, now))
+    return stream
+
+
+def main(messages: int, members: int):
+    stream = make_stream(messages, members)
+
+    tracker = make_tracker()
+    start = time.perf_counter()
+    flagged = sum(tracker.check(*message) is not None for message in stream)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracker = make_tracker()
+    for message in stream:
+        tracker.check(*message)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    print(f"{messages:,} messages from {members:,} members, {flagged:,} flagged")
+    print(f"Per message: {elapsed / messages * 1e6:.2f}us ({messages / elapsed:,.0f} messages/s)")
+    print(f"Tracked members: {len(tracker):,}, {used / len(tracker):.0f} bytes each")
+
+
+if __name__ == "__main__":
+    args = list(map(int, sys.argv[1:]))
+    main(*(args or [1_000_000, 20_000]))
@@ -0,0 +1,116 @@
+"""Benchmark the hot `cases` queries before and after the indexes in 0004_cases_indexes.sql.
+
+Seeds a synthetic case history into a scratch schema, times each query without
+indexes, applies the migration and times them again. The scratch schema is dropped
+afterwards. Run with `python -m benchmarks.cases_queries [rows]` from the repository
+root, with DATABASE_URL set like it is for the bot.
+"""
+import asyncio
+import statistics
+import sys
+import time
+from os import environ
+from pathlib import Path
+
+import asyncpg
+
+SCHEMA = "cases_bench"
+MIGRATION = Path("postgres/migrations/0004_cases_indexes.sql")
+GUILDS = 1_000
+TARGETS = 200_000
+RUNS = 200
+
+QUERIES = {
+    "active mute check": (
+        "SELECT * FROM cases WHERE guild_id = $1 AND target = $2 AND case_type = 'mute' "
+        "AND expired = False",
+        lambda i: (i % GUILDS, (i * 7919) % TARGETS),
+    ),
+    "pending expiries": (
+        "SELECT * FROM cases WHERE case_type = 'mute' AND expired = False "
+        "AND expires_at IS NOT NULL",
+        lambda i: (),
+    ),
+    "expire by case id": (
+        "UPDATE cases SET expired = True WHERE case_id = $1",
+        lambda i: (i * 104729,),
+    ),
+}
+
+
+async def seed(connection: asyncpg.Connection, rows: int):
+    await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await connection.execute(f"CREATE SCHEMA {SCHEMA}")
+    # case_type lives in public, so keep it on the search path.
+    await connection.execute(f"SET search_path TO {SCHEMA}, public")
+    await connection.execute(
+        """
+        CREATE TABLE cases (
+            case_id bigint,
+            guild_id bigint,
+            target bigint NOT NULL,
+            moderator bigint NOT NULL,
+            case_type case_type NOT NULL,
+            expired boolean,
+            expires_at timestamp,
+            reason varchar(150) NOT NULL DEFAULT 'No Reason Provided'
+        )
+        """
+    )
+    # Almost every historical case has already expired, only a handful are pending.
+    await connection.execute(
+        f"""
+        INSERT INTO cases (case_id, guild_id, target, moderator, case_type, expired, expires_at)
+        SELECT
+            n,
+            n % {GUILDS},
+            (n * 31) % {TARGETS},
+            n % 97,
+            (ARRAY['note', 'warn', 'mute', 'ban']::case_type[])[1 + n % 4],
+            n % 1000 != 0,
+            CASE WHEN n % 3 = 0 THEN now() + interval '1 hour' END
+        FROM generate_series(1, $1) AS n
+        """,
+        rows,
+    )
+    await connection.execute("ANALYZE cases")
+
+
+async def time_queries(connection: asyncpg.Connection) -> dict:
+    results = {}
+    for name, (query, args) in QUERIES.items():
+        timings = []
+        for i in range(RUNS):
+            transaction = connection.transaction()
+            await transaction.start()
+            start = time.perf_counter()
+            await connection.execute(query, *args(i))
+            timings.append((time.perf_counter() - start) * 1000)
+            await transaction.rollback()
+        timings.sort()
+        results[name] = (statistics.median(timings), timings[int(len(timings) * 0.99) - 1])
+    return results
+
+
+async def main(rows: int):
+    connection = await asyncpg.connect(environ["DATABASE_URL"])
+    try:
+        print(f"Seeding {rows} cases...")
+        await seed(connection, rows)
+        before = await time_queries(connection)
+
+        await connection.execute(MIGRATION.read_text())
+        await connection.execute("ANALYZE cases")
+        after = await time_queries(connection)
+
+        print(f"{'query':<20} {'before p50/p99 (ms)':>22} {'after p50/p99 (ms)':>22}")
+        for name in QUERIES:
+            (b50, b99), (a50, a99) = before[name], after[name]
+            print(f"{name:<20} {b50:>10.3f} / {b99:<9.3f} {a50:>10.3f} / {a99:<9.3f}")
+    finally:
+        await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000))
@@ -0,0 +1,64 @@
+"""Compare the NumPy filters in `bot.utils.filters` with the Pillow code they replace.
+
+Each filter is timed against its closest Pillow equivalent on the same synthetic image;
+`8bit` is the old upscale-to-1024 path from `Image.to_8bit`. Run with
+`python -m benchmarks.image_filters [size] [repeats]` from the repository root, with the
+environment set like it is for the bot, since the Pillow side is imported from the cog.
+"""
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+from bot.exts.image import pixelate as pillow_8bit
+from bot.utils import filters
+
+
+def pillow_pixelate(image: Image.Image) -> Image.Image:
+    return pillow_8bit(image.convert("RGBA").resize((1024, 1024)))
+
+
+CASES = {
+    "invert": (filters.invert, lambda image: ImageOps.invert(image.convert("RGB"))),
+    "grayscale": (filters.grayscale, ImageOps.grayscale),
+    "posterize": (filters.posterize, lambda image: ImageOps.posterize(image.convert("RGB"), 3)),
+    "pixelate": (filters.pixelate, pillow_pixelate),
+    "quantize": (filters.quantize, lambda image: image.convert("RGB").quantize(16)),
+    "edges": (filters.edges, lambda image: image.convert("L").filter(ImageFilter.FIND_EDGES)),
+}
+
+
+def make_image(size: int) -> Image.Image:
+    """A noisy gradient, so neither side gets to skip work on flat colour."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:size, 0:size]
+    base = np.stack([x * 255 // size, y * 255 // size, (x + y) * 127 // size], axis=-1)
+    noise = rng.integers(-16, 16, base.shape)
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB").convert("RGBA")
+
+
+def timed(func, image: Image.Image, repeats: int) -> float:
+    func(image)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func(image)
+    return (time.perf_counter() - start) / repeats
+
+
+def main(size: int, repeats: int):
+    image = make_image(size)
+    print(f"{size}x{size} RGBA, {repeats} runs each")
+    print(f"{'filter':<12}{'numpy':>12}{'pillow':>12}{'speedup':>10}")
+    for name, (numpy_func, pillow_func) in CASES.items():
+        numpy_time = timed(numpy_func, image, repeats)
+        pillow_time = timed(pillow_func, image, repeats)
+        print(
+            f"{name:<12}{numpy_time * 1000:>10.2f}ms{pillow_time * 1000:>10.2f}ms"
+            f"{pillow_time / numpy_time:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    args = list(map(int, sys.argv[1:]))
+    main(*(args or [1024, 10]))
@@ -0,0 +1,165 @@
+"""Run every image operation over a generated corpus and write the results as JSON.
+
+The corpus is PNG, JPEG, WEBP and animated GIF images from 64px to 4096px, generated
+from a fixed seed so every run sees the same bytes; their hashes are stored with the
+results so two files can be checked for a like-for-like comparison. Each operation is
+measured in its own freshly spawned process. A child inherits its parent's high-water
+mark, so the kernel's is reset before each input and memory is reported as the peak
+over what the process held beforehand; this needs Linux. Latency covers the whole `Image.run_pipeline` call, decode to encode. Run with
+`python -m benchmarks.images [output] [runs]` from the repository root, with the
+environment set like it is for the bot.
+"""
+import hashlib
+import json
+import multiprocessing
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import PIL
+from PIL import Image as PILImage
+
+from bot.exts.image import OPERATIONS, Image
+from bot.utils.exceptions import ImageTooLarge
+
+SIZES = (64, 256, 1024, 4096)
+FORMATS = ("PNG", "JPEG", "WEBP", "GIF")
+GIF_FRAMES = 4
+SEED = 0
+
+
+def make_frame(size: int, rng: np.random.Generator) -> PILImage.Image:
+    """Smooth gradients with a little noise, which compresses roughly like a photo."""
+    y, x = np.mgrid[0:size, 0:size]
+    phase = rng.integers(0, size)
+    base = np.stack(
+        [(x + phase) % size * 255 // size, y * 255 // size, (x + y) * 127 // size], axis=-1
+    )
+    noise = rng.integers(-12, 12, base.shape)
+    return PILImage.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+
+
+def make_corpus(directory: Path) -> dict:
+    """Write the corpus to `directory`, returning each input's name and SHA-256."""
+    rng = np.random.default_rng(SEED)
+    hashes = {}
+    for size in SIZES:
+        for fmt in FORMATS:
+            bytes_io = BytesIO()
+            if fmt == "GIF":
+                frames = [make_frame(size, rng) for _ in range(GIF_FRAMES)]
+                frames[0].save(
+                    bytes_io, fmt, save_all=True, append_images=frames[1:], duration=80, loop=0
+                )
+            else:
+                make_frame(size, rng).save(bytes_io, fmt)
+            name = f"{fmt.lower()}-{size}"
+            data = bytes_io.getvalue()
+            (directory / name).write_bytes(data)
+            hashes[name] = hashlib.sha256(data).hexdigest()
+    return hashes
+
+
+def runs_for(size: int, runs: int) -> int:
+    # The largest inputs take seconds each, so they get fewer runs.
+    return runs if size <= 1024 else max(3, runs // 10)
+
+
+def reset_peak_rss():
+    # Writing 5 resets the process's resident set high-water mark, VmHWM.
+    Path("/proc/self/clear_refs").write_text("5")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss can't be reset and carries over from the parent, so read VmHWM instead.
+    status = Path("/proc/self/status").read_text()
+    return int(re.search(r"VmHWM:\s*(\d+) kB", status).group(1)) / 1024
+
+
+def measure(operation: str, directory: str, names: list, runs: int) -> dict:
+    """Time one operation over the corpus. Runs in a child process of its own."""
+    inputs = {}
+    for name in names:
+        data = (Path(directory) / name).read_bytes()
+        times, stages = [], defaultdict(list)
+        reset_peak_rss()
+        baseline = peak_rss_mb()
+        try:
+            for _ in range(runs_for(int(name.rsplit("-", 1)[1]), runs)):
+                start = time.perf_counter()
+                result, timings = Image.run_pipeline(data, (operation,))
+                times.append(time.perf_counter() - start)
+                for stage, elapsed in timings:
+                    stages[stage].append(elapsed)
+        except ImageTooLarge as error:
+            inputs[name] = {"error": str(error)}
+            continue
+        peak = peak_rss_mb()
+
+        p50, p99 = np.percentile(times, [50, 99]) * 1000
+        inputs[name] = {
+            "runs": len(times),
+            "p50_ms": round(float(p50), 3),
+            "p99_ms": round(float(p99), 3),
+            "output_bytes": len(result),
+            "baseline_rss_mb": round(baseline, 1),
+            "peak_rss_mb": round(peak, 1),
+            "peak_increase_mb": round(peak - baseline, 1),
+            "stages_p50_ms": {
+                stage: round(float(np.median(values)) * 1000, 3) for stage, values in stages.items()
+            },
+        }
+    increases = [stats["peak_increase_mb"] for stats in inputs.values() if "error" not in stats]
+    return {"peak_increase_mb": max(increases, default=0.0), "inputs": inputs}
+
+
+def commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(output: str, runs: int):
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = make_corpus(Path(directory))
+        results = {}
+        for operation in OPERATIONS:
+            print(f"Measuring {operation}...", file=sys.stderr)
+            with context.Pool(1) as pool:
+                results[operation] = pool.apply(measure, (operation, directory, list(corpus), runs))
+
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__,
+        "runs": runs,
+        "corpus": corpus,
+        "operations": results,
+    }
+    Path(output).write_text(json.dumps(report, indent=2))
+
+    for operation, result in results.items():
+        print(f"{operation}: peak RSS +{result['peak_increase_mb']}MB")
+        for name, stats in result["inputs"].items():
+            if "error" in stats:
+                print(f"  {name:<12} rejected: {stats['error']}")
+            else:
+                print(
+                    f"  {name:<12} p50 {stats['p50_ms']:>9.2f}ms  p99 {stats['p99_ms']:>9.2f}ms  "
+                    f"{stats['output_bytes']:>10} bytes  +{stats['peak_increase_mb']}MB"
+                )
+
+
+if __name__ == "__main__":
+    output = sys.argv[1] if len(sys.argv) > 1 else "image-bench.json"
+    main(output, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
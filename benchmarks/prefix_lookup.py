@@ -0,0 +1,67 @@
+"""Micro-benchmark for the per-guild prefix cache used by `CustomPrefix.get_prefix`.
+
+Run with `python -m benchmarks.prefix_lookup` from the repository root.
+"""
+import random
+import timeit
+
+from discord.utils import find
+
+from bot.utils.prefixes import PrefixEntry, PrefixMatcher
+
+GUILD_COUNTS = (10, 100, 1_000, 10_000, 100_000)
+PREFIX_COUNTS = (1, 2, 5, 10)
+LOOKUPS = 100_000
+
+
+def guild_lookups():
+    print(f"{'guilds':>8} {'dict (ns/lookup)':>18} {'find (ns/lookup)':>18}")
+    for count in GUILD_COUNTS:
+        rng = random.Random(count)
+        guild_ids = [rng.getrandbits(63) for _ in range(count)]
+        prefixes = {
+            guild_id: PrefixMatcher((PrefixEntry("!", insensitive=True),))
+            for guild_id in guild_ids
+        }
+        records = [{"guild_id": guild_id, "prefix": "!"} for guild_id in guild_ids]
+        targets = [rng.choice(guild_ids) for _ in range(LOOKUPS)]
+
+        def dict_lookup():
+            for guild_id in targets:
+                prefixes[guild_id].match("!help")
+
+        dict_time = min(timeit.repeat(dict_lookup, number=1, repeat=5)) / LOOKUPS
+
+        # The old linear scan is far too slow to run 100k times on large tables.
+        scan_targets = targets[:max(10, LOOKUPS // count)]
+
+        def scan_lookup():
+            for guild_id in scan_targets:
+                find(lambda record: record["guild_id"] == guild_id, records)
+
+        scan_time = min(timeit.repeat(scan_lookup, number=1, repeat=3)) / len(scan_targets)
+
+        print(f"{count:>8} {dict_time * 1e9:>18.1f} {scan_time * 1e9:>18.1f}")
+
+
+def prefix_matches():
+    print(f"\n{'prefixes':>8} {'match (ns/message)':>20}")
+    candidates = ["!", "?", "bot ", "b!", ">>", "$", "hey bot ", "<@1234567890>", ".", "-"]
+    messages = ["hello there everyone", "BOT help", "!ping", "<@!1234567890> rank"] * 25
+    for count in PREFIX_COUNTS:
+        matcher = PrefixMatcher(
+            PrefixEntry(prefix, insensitive=bool(index % 2))
+            for index, prefix in enumerate(candidates[:count])
+        )
+
+        def match():
+            for content in messages:
+                matcher.match(content)
+
+        elapsed = min(timeit.repeat(match, number=100, repeat=5)) / (100 * len(messages))
+        print(f"{count:>8} {elapsed * 1e9:>20.1f}")
+
+
+if __name__ == "__main__":
+    guild_lookups()
+    prefix_matches()
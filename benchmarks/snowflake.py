@@ -0,0 +1,73 @@
+"""Benchmark and stress test `IDGenerator`.
+
+Measures ids per second for `next()` and `reserve()`, checks that blocks come back
+at the size asked for, then runs one generator per worker id in separate processes
+and checks that no id is repeated. Run with
+`python -m benchmarks.snowflake [processes] [ids per process]` from the repository root.
+"""
+import multiprocessing
+import sys
+import time
+
+from bot.utils.snowflake import MAX_SEQUENCE, MAX_WORKER_ID, IDGenerator
+
+BENCH_IDS = 1_000_000
+
+
+def rate(func, count: int) -> float:
+    start = time.perf_counter()
+    func(count)
+    return count / (time.perf_counter() - start)
+
+
+def generate(worker_id: int, count: int) -> list:
+    generator = IDGenerator(worker_id)
+    # Mix single ids and blocks, like commands and mass actions would.
+    ids = []
+    while len(ids) < count:
+        ids.append(next(generator))
+        block = generator.reserve(500)
+        if len(block) != 500:
+            raise AssertionError(f"Worker {worker_id} asked for 500 ids and got {len(block)}.")
+        ids.extend(block)
+    return ids[:count]
+
+
+def check_block_sizes() -> bool:
+    """Blocks that end exactly on, or run past, a millisecond's last sequence number."""
+    ok = True
+    for worker_id in (0, 1, 7, MAX_WORKER_ID):
+        for count in (MAX_SEQUENCE + 1, 10_000, 1):
+            generator = IDGenerator(worker_id)
+            got = len(generator.reserve(count)) + len(generator.reserve(count))
+            if got != 2 * count:
+                print(f"worker {worker_id}: reserve({count}) twice gave {got} ids")
+                ok = False
+    return ok
+
+
+def main(processes: int, per_process: int):
+    generator = IDGenerator()
+    print(f"next():        {rate(lambda n: [next(generator) for _ in range(n)], BENCH_IDS):>12,.0f} ids/s")
+    print(f"reserve(1):    {rate(lambda n: [generator.reserve(1) for _ in range(n)], BENCH_IDS):>12,.0f} ids/s")
+    print(f"reserve(1000): {rate(lambda n: [generator.reserve(1000) for _ in range(n // 1000)], BENCH_IDS):>12,.0f} ids/s")
+
+    if not check_block_sizes():
+        sys.exit(1)
+
+    # Half of these worker ids are odd, which is where an overflowing sequence used to
+    # clobber the worker id bits.
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(generate, [(worker, per_process) for worker in range(processes)])
+
+    total = sum(map(len, results))
+    unique = len(set().union(*results))
+    ordered = all(ids == sorted(ids) for ids in results)
+    print(f"\n{processes} processes made {total:,} ids, {unique:,} unique, ordered: {ordered}")
+    if unique != total or not ordered:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    args = list(map(int, sys.argv[1:]))
+    main(*(args or [8, 500_000]))
@@ -6,8 +6,21 @@ from discord import AllowedMentions, Intents
 from . import constants
 from .bot import Bot
 from .help_command import Help
+from .utils.pool import InstrumentedPool
+from .utils.queries import StatementConnection, prepare_statements
 
-db = asyncpg.create_pool(constants.DATABASE_URL)
+db = InstrumentedPool(
+    asyncpg.create_pool(
+        constants.DATABASE_URL,
+        min_size=constants.DB_POOL_MIN_SIZE,
+        max_size=constants.DB_POOL_MAX_SIZE,
+        statement_cache_size=constants.DB_STATEMENT_CACHE_SIZE,
+        connection_class=StatementConnection,
+        init=prepare_statements,
+    ),
+    max_size=constants.DB_POOL_MAX_SIZE,
+    acquire_timeout=constants.DB_ACQUIRE_TIMEOUT,
+)
 
 intents = Intents.default()
 intents.members = True
@@ -1,34 +1,85 @@
 import json
 import pkgutil
+import typing as t
 
 import aiohttp
 import asyncpg
+import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 
 from . import constants, exts
+from .utils.guild_settings import GuildSettingsRepository
+from .utils.fetch import ImageFetcher
+from .utils.image_cache import ImageCache
+from .utils.image_engine import ImageEngine
+from .utils.migrations import migrate
+from .utils.pool import InstrumentedPool
+from .utils.queries import Queries
 
 load_dotenv()
 
 class Bot(commands.Bot):
-    def __init__(self, db: asyncpg.pool.Pool, **kwargs):
+    def __init__(self, db: InstrumentedPool, **kwargs):
         self.db = db
+        self.queries = Queries(db)
+        self.guild_settings = GuildSettingsRepository(
+            self.queries, constants.GUILD_SETTINGS_CACHE_SIZE
+        )
         self.http_session = aiohttp.ClientSession()
+        self.image_fetcher = ImageFetcher(
+            self.http_session, constants.IMAGE_FETCH_TTL, max_bytes=constants.IMAGE_MAX_BYTES
+        )
+        self.image_engine = ImageEngine(constants.IMAGE_WORKERS, constants.IMAGE_QUEUE_SIZE)
+        self.image_cache = ImageCache(
+            constants.IMAGE_CACHE_BYTES, constants.IMAGE_CACHE_DIR, constants.IMAGE_CACHE_DISK_BYTES
+        )
+        # Set by the CustomPrefix cog, returns False for messages that can't be commands.
+        self.prefix_filter: t.Optional[t.Callable[[discord.Message], bool]] = None
+        self.skipped_messages = 0
         command_prefix = 'bot '
         super().__init__(command_prefix, **kwargs)
 
     async def initialize_database(self):
+        # Migrate on a separate connection so the pool only connects to a current schema.
+        connection = await asyncpg.connect(constants.DATABASE_URL)
+        try:
+            for migration in await migrate(connection, constants.MIGRATIONS_PATH):
+                print(f"Applied migration {migration.version:04}_{migration.name}")
+        finally:
+            await connection.close()
         await self.db
-        async with self.db.acquire() as conn:
-            await conn.execute(constants.SQL_PATH.read_text())
-
 
     async def start(self, token: str):
         await self.initialize_database()
+        self.image_engine.start()
         await super().start(token)
 
+    def could_be_command(self, message: discord.Message) -> bool:
+        """Cheaply check whether a message starts with one of its guild's prefixes."""
+        if self.prefix_filter is not None:
+            return self.prefix_filter(message)
+        if isinstance(self.command_prefix, str):
+            return message.content.startswith(self.command_prefix)
+        return True
+
+    async def process_commands(self, message: discord.Message):
+        if message.author.bot:
+            return
+
+        # Most messages aren't commands, so skip building a Context for them at all.
+        if not self.could_be_command(message):
+            self.skipped_messages += 1
+            return
+
+        await super().process_commands(message)
+
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.guild_settings.invalidate(guild.id)
+
     async def logout(self):
         await self.http_session.close()
+        self.image_engine.shutdown()
         await self.db.close()
         await super().logout()
 
@@ -11,7 +11,29 @@ BOT_TOKEN = environ["BOT_TOKEN"]
 DATABASE_URL = environ["DATABASE_URL"]
 DEFAULT_PREFIX = environ.get("DEFAULT_PREFIX", "bot ")
 EXT_PATH = Path("bot/exts")
-SQL_PATH = Path("postgres/init.sql")
+DB_POOL_MIN_SIZE = int(environ.get("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(environ.get("DB_POOL_MAX_SIZE", 10))
+DB_STATEMENT_CACHE_SIZE = int(environ.get("DB_STATEMENT_CACHE_SIZE", 100))
+DB_ACQUIRE_TIMEOUT = float(environ.get("DB_ACQUIRE_TIMEOUT", 10))
+WORKER_ID = int(environ["WORKER_ID"]) if "WORKER_ID" in environ else None
+MASS_ACTION_CONCURRENCY = int(environ.get("MASS_ACTION_CONCURRENCY", 5))
+AUTOMOD_MESSAGE_RATE = environ.get("AUTOMOD_MESSAGE_RATE", "8/5")
+AUTOMOD_DUPLICATE_RATE = environ.get("AUTOMOD_DUPLICATE_RATE", "4/15")
+AUTOMOD_MENTION_RATE = environ.get("AUTOMOD_MENTION_RATE", "10/15")
+AUTOMOD_MUTE_DURATION = int(environ.get("AUTOMOD_MUTE_DURATION", 600))
+EXPIRY_SWEEP_INTERVAL = float(environ.get("EXPIRY_SWEEP_INTERVAL", 60))
+EXPIRY_CONCURRENCY = int(environ.get("EXPIRY_CONCURRENCY", 10))
+GUILD_SETTINGS_CACHE_SIZE = int(environ.get("GUILD_SETTINGS_CACHE_SIZE", 1024))
+IMAGE_WORKERS = int(environ.get("IMAGE_WORKERS", 2))
+IMAGE_QUEUE_SIZE = int(environ.get("IMAGE_QUEUE_SIZE", 8))
+IMAGE_FETCH_TTL = float(environ.get("IMAGE_FETCH_TTL", 300))
+IMAGE_MAX_BYTES = int(environ.get("IMAGE_MAX_BYTES", 8 * 1024 ** 2))
+IMAGE_MAX_PIXELS = int(environ.get("IMAGE_MAX_PIXELS", 4096 * 4096))
+IMAGE_MAX_FRAME_PIXELS = int(environ.get("IMAGE_MAX_FRAME_PIXELS", 64 * 1024 ** 2))
+IMAGE_CACHE_BYTES = int(environ.get("IMAGE_CACHE_BYTES", 64 * 1024 ** 2))
+IMAGE_CACHE_DIR = Path(environ["IMAGE_CACHE_DIR"]) if "IMAGE_CACHE_DIR" in environ else None
+IMAGE_CACHE_DISK_BYTES = int(environ.get("IMAGE_CACHE_DISK_BYTES", 512 * 1024 ** 2))
+MIGRATIONS_PATH = Path("postgres/migrations")
 
 with open("bot/setup.json") as f:
     SETUP = json.load(f)
@@ -5,6 +5,10 @@ import discord
 from discord.ext import commands
 
 from ..command import command, group, example
+from ..utils.prefixes import MENTION_REGEX
+
+MAX_PREFIXES = 10
+MAX_PREFIX_LENGTH = 10
 
 
 class Administration(commands.Cog):
@@ -21,6 +25,7 @@ class Administration(commands.Cog):
         """
     <prefix>prefix !
     <prefix>prefix change !
+    <prefix>prefix add "bot "
     <prefix>prefix insensitive true
     """
     )
@@ -40,34 +45,23 @@ class Administration(commands.Cog):
     """
     )
     async def _change(self, ctx: commands.Context, prefix: str):
-        """Changes the prefix for your server.
+        """Changes the prefix for your server, replacing any other prefixes it had.
 
         NOTE: If you want to have spaces in your prefix, use quotes around the prefix
         Example: `{prefix}prefix change "bot "`
         """
-        if len(prefix) > 10:
-            return await ctx.send("Your prefix can't be that long!")
-
-        elif len(prefix) == 0:
-            return await ctx.send("Your prefix cannot be nothing.")
+        if error := self.check_prefix(prefix):
+            return await ctx.send(error)
 
         async with self.bot.db.acquire() as connection:
-            guild = await connection.fetchrow(
-                "SELECT * FROM guilds WHERE guild_id = $1", ctx.guild.id
-            )
-            if guild:
-                await connection.execute(
-                    "UPDATE guilds SET prefix = $1 WHERE guild_id = $2",
-                    prefix,
-                    ctx.guild.id,
+            async with connection.transaction():
+                queries = self.bot.queries
+                await queries.ensure_guild(ctx.guild.id, connection=connection)
+                insensitive = await queries.any_insensitive(ctx.guild.id, connection=connection)
+                await queries.clear_prefixes(ctx.guild.id, connection=connection)
+                await queries.upsert_prefix(
+                    ctx.guild.id, prefix, insensitive, connection=connection
                 )
-            else:
-                await connection.execute(
-                    "INSERT INTO guilds (guild_id, prefix) VALUES ($1, $2)",
-                    ctx.guild.id,
-                    prefix,
-                )
-            self.bot.dispatch('prefix_change')
         embed = discord.Embed(
             title=f"Set prefix to: {prefix}",
             colour=discord.Colour.green(),
@@ -78,6 +72,76 @@ class Administration(commands.Cog):
         )
         await ctx.send(embed=embed)
 
+    @_prefix.command(name="add")
+    @example(
+        """
+    <prefix>prefix add !
+    <prefix>prefix add "bot " true
+    """
+    )
+    async def _add(self, ctx: commands.Context, prefix: str, insensitive: bool = False):
+        """Adds another prefix for your server, optionally case insensitive.
+
+        NOTE: If you want to have spaces in your prefix, use quotes around the prefix"""
+        if error := self.check_prefix(prefix):
+            return await ctx.send(error)
+
+        async with self.bot.db.acquire() as connection:
+            async with connection.transaction():
+                queries = self.bot.queries
+                await queries.ensure_guild(ctx.guild.id, connection=connection)
+                count = await queries.count_prefixes(ctx.guild.id, connection=connection)
+                if count >= MAX_PREFIXES:
+                    return await ctx.send(f"You can't have more than {MAX_PREFIXES} prefixes!")
+                await queries.upsert_prefix(
+                    ctx.guild.id, prefix, insensitive, connection=connection
+                )
+        embed = discord.Embed(
+            title=f"Added prefix: {prefix}",
+            colour=discord.Colour.green(),
+            timestamp=datetime.utcnow(),
+        )
+        embed.set_footer(
+            text=f"Requested by {ctx.author}", icon_url=ctx.author.avatar_url
+        )
+        await ctx.send(embed=embed)
+
+    @_prefix.command(name="remove", aliases=("delete",))
+    @example(
+        """
+    <prefix>prefix remove !
+    """
+    )
+    async def _remove(self, ctx: commands.Context, prefix: str):
+        """Removes one of your server's prefixes."""
+        if not await self.bot.queries.remove_prefix(ctx.guild.id, prefix):
+            return await ctx.send("That isn't one of your prefixes!")
+        embed = discord.Embed(
+            title=f"Removed prefix: {prefix}",
+            colour=discord.Colour.green(),
+            timestamp=datetime.utcnow(),
+        )
+        embed.set_footer(
+            text=f"Requested by {ctx.author}", icon_url=ctx.author.avatar_url
+        )
+        await ctx.send(embed=embed)
+
+    @_prefix.command(name="list", aliases=("all",))
+    async def _list(self, ctx: commands.Context):
+        """Lists all of your server's prefixes."""
+        prefixes = await self.bot.queries.guild_prefixes(ctx.guild.id)
+        if not prefixes:
+            return await ctx.send("You didn't set your prefix yet!")
+        embed = discord.Embed(
+            title=f"Prefixes for {ctx.guild}",
+            description="\n".join(
+                f"`{record['prefix']}`{' (case insensitive)' * record['insensitive']}"
+                for record in prefixes
+            ),
+            colour=discord.Colour.green(),
+        )
+        await ctx.send(embed=embed)
+
     @_prefix.command(
         name="insensitive", aliases=("case_insensitive", "caseinsensitive")
     )
@@ -88,21 +152,11 @@ class Administration(commands.Cog):
     """
     )
     async def _insensitive_prefix(self, ctx: commands.Context, true_or_false: bool):
-        """Sets your prefix to case insensitive if you sent True and case sensitive if set to False.
+        """Sets all of your prefixes to case insensitive if you sent True and case sensitive if set to False.
 
         Prefixes are case sensitive by default."""
-        async with self.bot.db.acquire() as connection:
-            guild = await connection.fetchrow(
-                "SELECT * FROM guilds WHERE guild_id = $1", ctx.guild.id
-            )
-            if guild is not None and guild["prefix"] is not None:
-                await connection.execute(
-                    "UPDATE guilds SET insensitive = $1 WHERE guild_id = $2",
-                    true_or_false,
-                    ctx.guild.id,
-                )
-            else:
-                return await ctx.send("You didn't set your prefix yet!")
+        if not await self.bot.queries.set_insensitive(ctx.guild.id, true_or_false):
+            return await ctx.send("You didn't set your prefix yet!")
         embed = discord.Embed(
             title=f"Set prefix to case {'in' * int(true_or_false)}sensitive",
             colour=discord.Colour.green(),
@@ -113,6 +167,16 @@ class Administration(commands.Cog):
         )
         await ctx.send(embed=embed)
 
+    @staticmethod
+    def check_prefix(prefix: str) -> t.Optional[str]:
+        # A leading mention doesn't count towards the length, it's ~21 characters alone.
+        if match := MENTION_REGEX.match(prefix):
+            prefix = prefix[match.end():]
+        elif len(prefix) == 0:
+            return "Your prefix cannot be nothing."
+        if len(prefix) > MAX_PREFIX_LENGTH:
+            return "Your prefix can't be that long!"
+
     @commands.has_permissions(manage_channels=True)
     @command(name="slow_mode", aliases=("slowmode", "sm"))
     @example(
@@ -158,22 +222,7 @@ class Administration(commands.Cog):
 
         You can give 'yes', 'y', 'true', 't', '1', 'enable', 'on' if you want it on,
         or 'no', 'n', 'false', 'f', '0', 'disable', 'off' if you want it off. Casing does not matter."""
-        async with self.bot.db.acquire() as connection:
-            guild = await connection.fetchrow(
-                "SELECT * FROM guilds WHERE guild_id = $1", ctx.guild.id
-            )
-            if not guild:
-                await connection.execute(
-                    "INSERT INTO guilds (guild_id, level_up_messages) VALUES ($1, $2)",
-                    ctx.guild.id,
-                    true_or_false,
-                )
-            else:
-                await connection.execute(
-                    "UPDATE guilds SET level_up_messages = $1 WHERE guild_id = $2",
-                    true_or_false,
-                    guild["guild_id"],
-                )
+        await self.bot.guild_settings.update(ctx.guild.id, level_up_messages=true_or_false)
         embed = discord.Embed(
             description=f"**✅ Set level up messages to {'on' if true_or_false else 'off'}**"
         )
@@ -0,0 +1,67 @@
+import datetime
+from time import monotonic
+
+import discord
+from discord.ext import commands, tasks
+
+from bot import constants
+from bot.bot import Bot
+from bot.utils.automod import RateLimit, SpamLimits, SpamTracker
+
+
+class AutoMod(commands.Cog):
+    """Mutes members who flood a channel with messages, duplicates or mentions."""
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.tracker = SpamTracker(
+            SpamLimits(
+                messages=RateLimit.parse(constants.AUTOMOD_MESSAGE_RATE),
+                duplicates=RateLimit.parse(constants.AUTOMOD_DUPLICATE_RATE),
+                mentions=RateLimit.parse(constants.AUTOMOD_MENTION_RATE),
+            )
+        )
+        self.evict_idle.start()
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.guild is None or message.author.bot:
+            return
+
+        reason = self.tracker.check(
+            message.guild.id,
+            message.author.id,
+            message.content,
+            len(message.raw_mentions) + len(message.raw_role_mentions),
+            monotonic(),
+        )
+        if reason is None:
+            return
+
+        # Only look at permissions once someone trips a limit, it's too slow for every message.
+        if message.author.guild_permissions.manage_messages:
+            return
+        moderation = self.bot.get_cog("Moderation")
+        if moderation is None:
+            return
+
+        self.tracker.reset(message.guild.id, message.author.id)
+        ctx = await self.bot.get_context(message)
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(
+            seconds=constants.AUTOMOD_MUTE_DURATION
+        )
+        await moderation.apply_mute(
+            ctx, message.author, f"[AutoMod] {reason}", expires_at, moderator=message.guild.me
+        )
+
+    @tasks.loop(minutes=1)
+    async def evict_idle(self):
+        self.tracker.evict_idle(monotonic())
+
+    def cog_unload(self):
+        self.evict_idle.cancel()
+
+
+def setup(bot: Bot):
+    bot.add_cog(AutoMod(bot))
+    print("Loaded AutoMod")
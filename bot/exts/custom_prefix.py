@@ -1,50 +1,159 @@
+import asyncio
+import json
+import logging
+
+import asyncpg
 import discord
 from discord.ext import commands
-from discord.utils import find
-from asyncpg import Record
-import asyncio
 import typing as t
 
 from bot.bot import Bot
+from bot.utils.prefixes import PrefixEntry, PrefixMatcher
+
+log = logging.getLogger(__name__)
+
+PREFIX_CHANNEL = "prefix_change"
+# Seconds to wait between attempts to reconnect the listener, doubling up to the max.
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 60
 
 class CustomPrefix(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.default_prefix = 'bot '
-        self.prefixes: t.Optional[t.List[Record]] = None
+        self.prefixes: t.Dict[int, PrefixMatcher] = {}
+        self.listener: t.Optional[asyncpg.Connection] = None
+        # Notifications that arrive while the table is being read, replayed on top of it.
+        self._pending: t.Optional[t.List[str]] = None
+        self.unloaded = False
+        bot.loop.create_task(self.load_prefixes())
 
     def get_prefix(self, bot: commands.Bot, message: discord.Message):
-        prefix = None
-        if self.prefixes is not None:
-            guild = find(
-                lambda record: record.get("guild_id") == message.guild.id,
-                self.prefixes,
-            )
-            if guild is not None:
-                if guild["insensitive"]:
-                    if message.content.lower().startswith(guild["prefix"]):
-                        prefix = message.content[:len(guild["prefix"])]
-                else:
-                    prefix = guild["prefix"]
-        if prefix is None:
+        if message.guild is None:
             return self.default_prefix
-        else:
-            return prefix
 
-    @commands.Cog.listener()
-    async def on_prefix_change(self):
-        async with self.bot.db.acquire() as connection:
-            self.prefixes = await connection.fetch(
-                "SELECT * FROM guilds WHERE prefix IS NOT NULL"
+        matcher = self.prefixes.get(message.guild.id)
+        if matcher is None:
+            return self.default_prefix
+
+        # discord.py only checks `startswith`, so we hand back the prefix exactly as
+        # it appears in the message, falling back to the guild's first prefix.
+        return matcher.match(message.content) or matcher.default
+
+    def could_be_command(self, message: discord.Message) -> bool:
+        if message.guild is None:
+            return True
+
+        matcher = self.prefixes.get(message.guild.id)
+        if matcher is None:
+            return message.content.startswith(self.default_prefix)
+        return matcher.match(message.content) is not None
+
+    async def load_prefixes(self):
+        await self.bot.wait_until_ready()
+        await self.connect()
+
+    async def connect(self):
+        """Start the listener and load every prefix, retrying with backoff until it works."""
+        delay = RECONNECT_DELAY
+        while not self.unloaded:
+            try:
+                await self.listen()
+                return
+            except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as error:
+                log.warning("Couldn't start the prefix listener: %s", error)
+                await self.close_listener()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def listen(self):
+        """Start listening for prefix changes, then warm the cache from the table.
+
+        We start listening before reading the table so that no update can slip in
+        between the two. Notifications that arrive while the read is in flight are held
+        back and replayed on the new cache, since applying them to the old one would
+        lose them when it's replaced. Replaying one the read already saw is harmless,
+        adds and removes are idempotent."""
+        self._pending = []
+        self.listener = await self.bot.db.acquire()
+        self.listener.add_termination_listener(self.on_listener_terminated)
+        await self.listener.add_listener(PREFIX_CHANNEL, self.on_prefix_notify)
+
+        records = await self.bot.queries.all_prefixes()
+
+        entries: t.Dict[int, t.List[PrefixEntry]] = {}
+        for record in records:
+            entries.setdefault(record["guild_id"], []).append(
+                PrefixEntry(record["prefix"], record["insensitive"])
             )
+        self.prefixes = {guild_id: PrefixMatcher(guild) for guild_id, guild in entries.items()}
+
+        pending, self._pending = self._pending, None
+        for payload in pending:
+            self.apply_change(payload)
+
+    def on_listener_terminated(self, connection: asyncpg.Connection):
+        if connection is not self.listener or self.unloaded:
+            return
+        log.warning("Prefix listener connection was lost, reconnecting.")
+        self.listener = None
+        self.bot.loop.create_task(self.reconnect(connection))
+
+    async def reconnect(self, dead: asyncpg.Connection):
+        """Reconnect the listener and reload every prefix, since changes made while we
+        were disconnected were never notified."""
+        await self.bot.db.release(dead)
+        await self.connect()
+
+    async def close_listener(self):
+        # Anything held back for a load that didn't finish is covered by the next one.
+        self._pending = None
+        listener, self.listener = self.listener, None
+        if listener is None:
+            return
+        if not listener.is_closed():
+            await listener.remove_listener(PREFIX_CHANNEL, self.on_prefix_notify)
+        await self.bot.db.release(listener)
+
+    def on_prefix_notify(
+        self, connection: asyncpg.Connection, pid: int, channel: str, payload: str
+    ):
+        if self._pending is not None:
+            self._pending.append(payload)
+        else:
+            self.apply_change(payload)
+
+    def apply_change(self, payload: str):
+        """Patch a single guild's matcher from a `prefix_change` notification."""
+        data = json.loads(payload)
+        guild_id = data["guild_id"]
+
+        if data["op"] == "delete":
+            matcher = self.prefixes.get(guild_id)
+            if matcher is not None:
+                matcher.remove(data["prefix"])
+                if not matcher:
+                    del self.prefixes[guild_id]
+        else:
+            entry = PrefixEntry(data["prefix"], data["insensitive"])
+            if (matcher := self.prefixes.get(guild_id)) is not None:
+                matcher.add(entry)
+            else:
+                self.prefixes[guild_id] = PrefixMatcher((entry,))
 
-    async def cog_unload(self):
+    def cog_unload(self):
+        # discord.py calls this synchronously, so the prefix hooks are reset here and
+        # only the connection cleanup is deferred to a task.
+        self.unloaded = True
         self.bot.command_prefix = self.default_prefix
+        self.bot.prefix_filter = None
+        self.bot.loop.create_task(self.close_listener())
 
 def setup(bot: Bot):
     cog = CustomPrefix(bot)
 
     bot.add_cog(cog)
     bot.command_prefix = cog.get_prefix
+    bot.prefix_filter = cog.could_be_command
 
-    print("Loaded CustomPrefix")
\ No newline at end of file
+    print("Loaded CustomPrefix")
@@ -1,5 +1,8 @@
 import asyncio
+from collections import defaultdict
 from io import BytesIO
+from math import ceil
+from time import perf_counter
 import typing as t
 
 import discord
@@ -7,34 +10,249 @@ from discord.ext import commands
 import PIL
 from PIL import ImageOps
 
+from bot import constants
 from bot.command import command, example
+from bot.utils import filters
 from bot.utils.converters import ImageConverter
+from bot.utils.imaging import (
+    Frame,
+    animation_info,
+    encode,
+    extension,
+    iter_frames,
+    join_frames,
+    open_image,
+    pack_frame,
+)
+from bot.utils.queries import QueryStats
 
+MAX_STEPS = 8
+Timings = t.List[t.Tuple[str, float]]
+
+
+def invert(image: PIL.Image.Image) -> PIL.Image.Image:
+    return ImageOps.invert(image.convert(mode="RGB"))
+
+
+def pixelate(image: PIL.Image.Image) -> PIL.Image.Image:
+    size = image.size
+    return image.convert("RGBA").resize((32, 32), resample=PIL.Image.NEAREST).resize(
+        size, resample=PIL.Image.NEAREST
+    ).quantize()
+
+
+def grayscale(image: PIL.Image.Image) -> PIL.Image.Image:
+    # Pillow's single-channel conversion is several times faster than the NumPy filter.
+    return ImageOps.grayscale(image)
+
+
+# Operations a pipeline can be built from, by the name users type.
+OPERATIONS: t.Dict[str, t.Callable[[PIL.Image.Image], PIL.Image.Image]] = {
+    "invert": invert,
+    "8bit": pixelate,
+    "grayscale": grayscale,
+    "pixelate": filters.pixelate,
+    "quantize": filters.quantize,
+    "posterize": filters.posterize,
+    "edges": filters.edges,
+}
+# The size a static image is scaled to when it starts with this operation. Animations
+# are left at their own size so every frame doesn't get blown up.
+WORKING_SIZES = {"8bit": (1024, 1024)}
+# Operations whose output is pixel art, which encodes best as a palette PNG. The last
+# step of a pipeline decides; anything else is treated as a photo.
+PALETTE_OUTPUTS = {"8bit", "pixelate", "quantize"}
+
+
+def choose_preset(steps: t.Sequence[str], animated: bool, fast: bool = False) -> str:
+    if animated:
+        preset = "animation"
+    elif steps[-1] in PALETTE_OUTPUTS:
+        preset = "palette"
+    else:
+        preset = "photo"
+    return f"{preset}-fast" if fast else preset
 
 
 class Image(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.stage_stats: t.Dict[str, QueryStats] = defaultdict(QueryStats)
+        # Encode time and output size per preset, to tune `PRESETS` from real results.
+        self.encode_stats: t.Dict[str, QueryStats] = defaultdict(QueryStats)
+        self.output_sizes: t.Dict[str, QueryStats] = defaultdict(QueryStats)
+
+    async def process(self, steps: t.Sequence[str], image: bytes) -> t.Tuple[bytes, Timings]:
+        """Run a pipeline on the image engine, or reuse the result from a previous run.
+
+        Returns the encoded image and how long each stage took, which is empty when the
+        result came from the cache."""
+        key = self.bot.image_cache.key(image, "|".join(steps))
+        if (result := await self.bot.image_cache.get(key)) is not None:
+            return result, []
+        # Even reading the frame count can decode frames, so it's done on the engine too.
+        count, loop = await self.bot.image_engine.run(
+            animation_info, image, constants.IMAGE_MAX_PIXELS, constants.IMAGE_MAX_FRAME_PIXELS
+        )
+        animated = count > 1
+        preset = choose_preset(steps, animated, self.bot.image_engine.busy)
+        if animated:
+            result, timings = await self.process_animated(tuple(steps), image, count, loop, preset)
+        else:
+            result, timings = await self.bot.image_engine.run(
+                self.run_pipeline, image, tuple(steps), preset
+            )
+        for stage, elapsed in timings:
+            self.stage_stats[stage].record(elapsed)
+            if stage == "encode":
+                self.encode_stats[preset].record(elapsed)
+        self.output_sizes[preset].record(len(result))
+        # The key doesn't include the preset, so only full quality results are cached;
+        # otherwise a result rushed out while the engine was busy would be served for
+        # good. Cached ones are still used when it's busy, which only saves work.
+        if not preset.endswith("-fast"):
+            await self.bot.image_cache.put(key, result)
+        return result, timings
+
+    async def process_animated(
+        self, steps: t.Tuple[str, ...], image: bytes, count: int, loop: int, preset: str
+    ) -> t.Tuple[bytes, Timings]:
+        """Spread an animation's frames over the workers in chunks.
+
+        Every worker decodes its own range of frames from the source, so decoded frames
+        never pass through this process; only their compressed results come back on the
+        way to the worker that joins them. Decode and step times are summed over every
+        frame, the encode time includes getting the frames to the joining worker."""
+        engine = self.bot.image_engine
+        size = ceil(count / engine.max_workers)
+        chunks = await asyncio.gather(*(
+            engine.run(self.run_frames, image, start, min(start + size, count), steps)
+            for start in range(0, count, size)
+        ))
+        frames = [frame for chunk, _, _ in chunks for frame in chunk]
+        durations = [duration for _, chunk_durations, _ in chunks for duration in chunk_durations]
+        totals = defaultdict(float)
+        for _, _, chunk_timings in chunks:
+            for stage, elapsed in chunk_timings:
+                totals[stage] += elapsed
+        timings = list(totals.items())
+
+        start = perf_counter()
+        result = await engine.run(join_frames, frames, durations, loop, preset)
+        timings.append(("encode", perf_counter() - start))
+        return result, timings
+
+    # These run in the image engine's worker processes, so they take and return bytes.
 
     @staticmethod
-    def invert_image(image: BytesIO) -> BytesIO:
-        image = PIL.Image.open(image)
-        inverted_image = ImageOps.invert(image.convert(mode="RGB"))
-        bytes_io = BytesIO()
-        inverted_image.save(bytes_io, "WEBP")
-        return bytes_io
+    def run_frames(
+        image: bytes, start: int, stop: int, steps: t.Tuple[str, ...]
+    ) -> t.Tuple[t.List[Frame], t.List[int], Timings]:
+        """Apply the steps to frames `start` to `stop`, returning them packed with durations."""
+        timings = defaultdict(float)
+        processed, durations = [], []
+        began = perf_counter()
+        for frame, duration in iter_frames(image, start, stop, constants.IMAGE_MAX_PIXELS):
+            timings["decode"] += perf_counter() - began
+            for step in steps:
+                began = perf_counter()
+                frame = OPERATIONS[step](frame)
+                timings[step] += perf_counter() - began
+            processed.append(pack_frame(frame))
+            durations.append(duration)
+            began = perf_counter()
+        return processed, durations, list(timings.items())
 
     @staticmethod
-    def to_8bit(image: BytesIO) -> BytesIO:
-        avatar = PIL.Image.open(image)
-        avatar = avatar.convert("RGBA").resize((1024, 1024))
-        eightbit = avatar.resize((32, 32), resample=PIL.Image.NEAREST).resize(
-            (1024, 1024), resample=PIL.Image.NEAREST
+    def run_pipeline(
+        image: bytes, steps: t.Tuple[str, ...], preset: t.Optional[str] = None
+    ) -> t.Tuple[bytes, Timings]:
+        """Decode once, apply every step in memory, then encode once.
+
+        Animations are handled here too, one frame after another; the cog spreads them
+        over the workers instead. The result is encoded with `preset`, or the one
+        `choose_preset` picks for the steps if none is given."""
+        count, loop = animation_info(
+            image, constants.IMAGE_MAX_PIXELS, constants.IMAGE_MAX_FRAME_PIXELS
         )
-        eightbit = eightbit.quantize()
-        bytes_io = BytesIO()
-        eightbit.save(bytes_io, "WEBP")
-        return bytes_io
+        animated = count > 1
+        preset = preset or choose_preset(steps, animated)
+        if animated:
+            frames, durations, timings = Image.run_frames(image, 0, count, steps)
+            start = perf_counter()
+            result = join_frames(frames, durations, loop, preset)
+            timings.append(("encode", perf_counter() - start))
+            return result, timings
+
+        timings = []
+        start = perf_counter()
+        size = WORKING_SIZES.get(steps[0])
+        image = open_image(image, constants.IMAGE_MAX_PIXELS, size)
+        if size is not None:
+            image = image.convert("RGBA").resize(size)
+        image.load()
+        timings.append(("decode", perf_counter() - start))
+
+        for step in steps:
+            start = perf_counter()
+            image = OPERATIONS[step](image)
+            timings.append((step, perf_counter() - start))
+
+        start = perf_counter()
+        result = encode(image, preset)
+        timings.append(("encode", perf_counter() - start))
+        return result, timings
+
+    @staticmethod
+    def invert_image(image: bytes) -> bytes:
+        return Image.run_pipeline(image, ("invert",))[0]
+
+    @staticmethod
+    def to_8bit(image: bytes) -> bytes:
+        return Image.run_pipeline(image, ("8bit",))[0]
+
+    async def send_result(
+        self, ctx: commands.Context, step: str, image: t.Optional[BytesIO], title: str
+    ) -> None:
+        bytes_image = image or await ImageConverter().convert(ctx, image)
+        result, _ = await self.process((step,), bytes_image.getvalue())
+        embed = discord.Embed(title=title, colour=discord.Colour.blurple())
+        filename = f"{step}.{extension(result)}"
+        file = discord.File(BytesIO(result), filename=filename)
+        embed.set_image(url=f"attachment://{filename}")
+        await ctx.send(file=file, embed=embed)
+
+    @command(name="image", aliases=("pipeline",))
+    @example(
+        """
+    <prefix>image 8bit|invert @john doe
+    <prefix>image grayscale|invert some-image-link.com
+    """
+    )
+    async def _image(self, ctx: commands.Context, steps: str, image: ImageConverter = None) -> None:
+        """Apply several operations to an image in one go, separated by `|`.
+
+        The available operations are `invert`, `8bit`, `grayscale`, `pixelate`, `quantize`,
+        `posterize` and `edges`."""
+        steps = [step.strip().lower() for step in steps.split("|")]
+        if unknown := [step for step in steps if step not in OPERATIONS]:
+            raise commands.BadArgument(
+                f"Unknown operation `{unknown[0]}`, pick from {', '.join(OPERATIONS)}."
+            )
+        if len(steps) > MAX_STEPS:
+            raise commands.BadArgument(f"You can chain at most {MAX_STEPS} operations.")
+
+        bytes_image = image or await ImageConverter().convert(ctx, image)
+        result, timings = await self.process(steps, bytes_image.getvalue())
+        embed = discord.Embed(title=" → ".join(steps), colour=discord.Colour.blurple())
+        if timings:
+            embed.set_footer(
+                text=" | ".join(f"{stage} {elapsed * 1000:.0f}ms" for stage, elapsed in timings)
+            )
+        filename = f"image.{extension(result)}"
+        file = discord.File(BytesIO(result), filename=filename)
+        embed.set_image(url=f"attachment://{filename}")
+        await ctx.send(file=file, embed=embed)
 
     @command(aliases=("invertavatar", "invert_avatar"))
     @example(
@@ -48,14 +266,11 @@ class Image(commands.Cog):
 
         You can also specify a link that leads to an image, or an attachment."""
         bytes_image = image or await ImageConverter().convert(ctx, image)
-        bytes_image.seek(0)
-        image = await self.bot.loop.run_in_executor(
-            None, self.invert_image, bytes_image
-        )
-        image.seek(0)
+        image, _ = await self.process(("invert",), bytes_image.getvalue())
         embed = discord.Embed(title="Inverted image.", colour=discord.Colour.green())
-        file = discord.File(image, filename="inverted.webp")
-        embed.set_image(url="attachment://inverted.webp")
+        filename = f"inverted.{extension(image)}"
+        file = discord.File(BytesIO(image), filename=filename)
+        embed.set_image(url=f"attachment://{filename}")
         await ctx.send(file=file, embed=embed)
 
     @command(name="8bit", aliases=("8-bit", "8_bit"))
@@ -70,14 +285,78 @@ class Image(commands.Cog):
 
         You can also specify a link that leads to an image, or an attachment."""
         bytes_image = image or await ImageConverter().convert(ctx, image)
-        bytes_image.seek(0)
-        eightbit = await self.bot.loop.run_in_executor(None, self.to_8bit, bytes_image)
-        eightbit.seek(0)
+        eightbit, _ = await self.process(("8bit",), bytes_image.getvalue())
         embed = discord.Embed(title="8bit Image!", colour=discord.Colour.orange())
-        file = discord.File(eightbit, filename="8bit.webp")
-        embed.set_image(url="attachment://8bit.webp")
+        filename = f"8bit.{extension(eightbit)}"
+        file = discord.File(BytesIO(eightbit), filename=filename)
+        embed.set_image(url=f"attachment://{filename}")
         await ctx.send(file=file, embed=embed)
 
+    @command(aliases=("blocky",))
+    @example(
+        """
+    <prefix>pixelate @john doe
+    <prefix>blocky some-image-link.com
+    """
+    )
+    async def pixelate(self, ctx: commands.Context, image: ImageConverter = None) -> None:
+        """Pixelate an image into blocks, keeping its size.
+
+        You can also specify a link that leads to an image, or an attachment."""
+        await self.send_result(ctx, "pixelate", image, "Pixelated image.")
+
+    @command(aliases=("palette",))
+    @example(
+        """
+    <prefix>quantize @john doe
+    <prefix>palette some-image-link.com
+    """
+    )
+    async def quantize(self, ctx: commands.Context, image: ImageConverter = None) -> None:
+        """Redraw an image using a 16 colour pixel art palette.
+
+        You can also specify a link that leads to an image, or an attachment."""
+        await self.send_result(ctx, "quantize", image, "Quantized image.")
+
+    @command(aliases=("poster",))
+    @example(
+        """
+    <prefix>posterize @john doe
+    <prefix>poster some-image-link.com
+    """
+    )
+    async def posterize(self, ctx: commands.Context, image: ImageConverter = None) -> None:
+        """Cut an image down to a handful of shades per colour channel.
+
+        You can also specify a link that leads to an image, or an attachment."""
+        await self.send_result(ctx, "posterize", image, "Posterized image.")
+
+    @command(aliases=("greyscale", "gray", "grey"))
+    @example(
+        """
+    <prefix>grayscale @john doe
+    <prefix>grey some-image-link.com
+    """
+    )
+    async def grayscale(self, ctx: commands.Context, image: ImageConverter = None) -> None:
+        """Turn an image black and white.
+
+        You can also specify a link that leads to an image, or an attachment."""
+        await self.send_result(ctx, "grayscale", image, "Grayscale image.")
+
+    @command(aliases=("outline",))
+    @example(
+        """
+    <prefix>edges @john doe
+    <prefix>outline some-image-link.com
+    """
+    )
+    async def edges(self, ctx: commands.Context, image: ImageConverter = None) -> None:
+        """Highlight the edges in an image.
+
+        You can also specify a link that leads to an image, or an attachment."""
+        await self.send_result(ctx, "edges", image, "Edges.")
+
 
 def setup(bot):
     bot.add_cog(Image(bot))
@@ -57,13 +57,17 @@ class Info(commands.Cog):
 
         async with self.bot.db.acquire() as connection:
             now = perf_counter()
-            await connection.execute("SELECT 1")
+            await self.bot.queries.ping(connection=connection)
             db_delay = (perf_counter() - now) * 1000
+        pool = self.bot.db.stats
         embed = discord.Embed(
             title="🏓 Pong!",
             description=(f"Bot latency: `{round(self.bot.latency * 1000)}ms`\n"
                          f"Command Processing Time: `{delay}ms`\n"
-                         f"Database Delay: `{round(db_delay)}ms`"
+                         f"Database Delay: `{round(db_delay)}ms`\n"
+                         f"Database Pool: `{pool.in_use}/{self.bot.db.max_size}` in use, "
+                         f"`{pool.waiting}` waiting, "
+                         f"`{pool.average_wait * 1000:.2f}ms` average wait"
                         ),               
         )
         await ctx.send(embed=embed)
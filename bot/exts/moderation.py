@@ -1,31 +1,145 @@
+import asyncio
 import datetime
+import logging
 import typing as t
-from time import time
+from collections import defaultdict
 
+import asyncpg
 import discord
-from discord import User, Member, utils
-from discord.ext import commands
+from discord import User, Member
+from discord.ext import commands, tasks
 from discord.ext.commands import Context
 from discord.utils import find
 
+from bot import constants
 from bot.utils.converters import TimeConverter
 from bot.utils.decorators import role_hierarchy
+from bot.utils.pagination import LazyPaginatedView
+from bot.utils.queries import Queries
+from bot.utils.scheduler import ExpiryScheduler
+from bot.utils.snowflake import IDGenerator
 
-class IDGenerator:
-    def __init__(self):
-        self.wid = 0
-        self.inc = 0
+log = logging.getLogger(__name__)
+
+MASS_ACTION_RETRIES = 3
+# The length of `cases.reason`.
+MAX_REASON_LENGTH = 150
+CASES_PER_PAGE = 10
+# Larger than any case id, so the first page starts from the newest case.
+NEWEST_CASE = 2 ** 63 - 1
+
+
+class CaseHistory:
+    """Pages through a guild's or member's cases, newest first, with keyset pagination.
+
+    Each page is fetched as the cases below the last id of the page before it. We remember
+    where every page we've seen starts, and jumping ahead only skips over case ids."""
+
+    def __init__(self, queries: Queries, guild_id: int, target: t.Optional[int] = None):
+        self.queries = queries
+        self.guild_id = guild_id
+        self.target = target
+        self.starts: t.Dict[int, int] = {0: NEWEST_CASE}
+
+    async def start_of(self, index: int) -> t.Optional[int]:
+        if index not in self.starts:
+            known = max(page for page in self.starts if page < index)
+            self.starts[index] = await self.queries.cases_cursor(
+                self.guild_id,
+                self.target,
+                self.starts[known],
+                (index - known) * CASES_PER_PAGE - 1,
+            )
+        return self.starts[index]
+
+    async def page(self, index: int) -> t.List[asyncpg.Record]:
+        start = await self.start_of(index)
+        if start is None:
+            return []
+        cases = await self.queries.cases_page(self.guild_id, self.target, start, CASES_PER_PAGE)
+        if len(cases) == CASES_PER_PAGE:
+            self.starts[index + 1] = cases[-1]["case_id"]
+        return cases
+
+
+def is_moderator_role(role: discord.Role) -> bool:
+    permissions = role.permissions
+    return (
+        permissions.administrator
+        or permissions.ban_members
+        or permissions.kick_members
+        or permissions.manage_roles
+    )
+
+
+class MutedRoleResolver:
+    """Finds each guild's muted role once and remembers its id.
+
+    The role is looked up from the guild settings, then by name, and created as a last
+    resort. A lock per guild makes sure mutes racing each other only create one role."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.role_ids: t.Dict[int, int] = {}
+        self.locks: t.DefaultDict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def get(self, guild: discord.Guild, *, create: bool = True) -> t.Optional[discord.Role]:
+        if role := self._cached(guild):
+            return role
+
+        async with self.locks[guild.id]:
+            # Someone else may have resolved it while we waited.
+            if role := self._cached(guild):
+                return role
+
+            settings = await self.bot.guild_settings.get(guild.id)
+            role = guild.get_role(settings.muted_role) or find(
+                lambda role: role.name.lower() == "muted", guild.roles
+            )
+            if role is None and create:
+                role = await self.create(guild)
+            if role is not None:
+                if role.id != settings.muted_role:
+                    await self.bot.guild_settings.update(guild.id, muted_role=role.id)
+                self.role_ids[guild.id] = role.id
+            return role
+
+    def _cached(self, guild: discord.Guild) -> t.Optional[discord.Role]:
+        role_id = self.role_ids.get(guild.id)
+        return guild.get_role(role_id) if role_id is not None else None
+
+    @staticmethod
+    async def create(guild: discord.Guild) -> discord.Role:
+        role = await guild.create_role(
+            name="Muted",
+            permissions=discord.Permissions(send_messages=False, speak=False),
+            colour=0x808080,
+            reason="New Muted role for mods.",
+        )
+        # Channel overwrites deny sending whatever the role's position, so it only needs to
+        # stay below the moderators; above them, a muted member would outrank them and
+        # the hierarchy checks would stop anyone unmuting them. New roles start at 1.
+        moderators = [
+            other.position
+            for other in guild.roles
+            if other != role and not other.is_default() and is_moderator_role(other)
+        ]
+        if moderators and (position := min(min(moderators), guild.me.top_role.position - 1)) > 1:
+            await role.edit(position=position)
+        return role
+
+    def invalidate(self, role: discord.Role):
+        if self.role_ids.get(role.guild.id) == role.id:
+            del self.role_ids[role.guild.id]
 
-    def __next__(self):
-        t = round(time() * 1000) - 1609459200000
-        self.inc += 1
-        return (t << 14) | (self.wid << 6) | (self.inc % 2 ** 6)
 
 class Moderation(commands.Cog):
     def __init__(self, bot: commands.Bot):
         super().__init__()
         self.bot = bot
-        bot.loop.create_task(self.setup_timed_events())
+        self.scheduler = ExpiryScheduler(self.expire_cases)
+        self.muted_roles = MutedRoleResolver(bot)
+        bot.loop.create_task(self.load_expiries())
 
     @commands.has_permissions(ban_members=True)
     @commands.command(aliases=("permban", "permaban"))
@@ -45,36 +159,15 @@ class Moderation(commands.Cog):
     @commands.command()
     @role_hierarchy()
     async def unmute(self, ctx: Context, member: Member, *, reason: str = None):
-        async with self.bot.db.acquire() as connection:
-            guild = await connection.fetchrow(
-                "SELECT * FROM guilds WHERE guild_id = $1", ctx.guild.id
+        muted_role = await self.muted_roles.get(ctx.guild, create=False)
+        if muted_role and muted_role in member.roles:
+            await member.remove_roles(muted_role)
+            await self.bot.queries.expire_mutes(ctx.guild.id, member.id)
+            await ctx.send(embed=discord.Embed(title=f"✅ {member} was unmuted."))
+        else:
+            await ctx.send(
+                "This person is either not muted or they have the wrong muted role for this bot."
             )
-            if not guild:
-                await ctx.send("No mutes found here.")
-            muted_role = ctx.guild.get_role(guild["muted_role"])
-            if muted_role:
-                if muted_role in member.roles:
-                    await member.remove_roles(muted_role)
-                    await connection.execute(
-                        "UPDATE cases SET expired = True WHERE userid = $1", member.id
-                    )
-                    await ctx.send(embed=discord.Embed(title=f"✅ {member} was unmuted."))
-                else:
-                    await ctx.send(
-                        "This person is either not muted or they have the wrong muted role for this bot."
-                    )
-
-            else:
-                muted_role = find(
-                    lambda role: role.name.lower() == "muted", ctx.guild.roles
-                )
-                if muted_role and muted_role in member.roles:
-                    await member.remove_roles(muted_role)
-                    await ctx.send(
-                        embed=discord.Embed(title=f"✅ {member} was unmuted.")
-                    )
-                else:
-                    await ctx.send("This person is not muted.")
 
     async def apply_ban(
         self, ctx: Context, member: Member, mod: Member, reason: str = None
@@ -83,83 +176,200 @@ class Moderation(commands.Cog):
             await ctx.guild.ban(member, reason=reason)
         except discord.Forbidden:
             return await ctx.send(f"Sorry {mod.mention}, I can't ban that user!")
-        async with self.bot.db.acquire() as connection:
-            await connection.execute(
-                "INSERT INTO cases (case_id, guild_id, target, moderator, case_type, reason) "
-                "VALUES ($1, $2, $3, $4, $5, $6)",
-                next(self.bot.idgen), ctx.guild.id, member.id, mod.id, "ban", reason,
-            )
+        await self.bot.queries.insert_case(
+            next(self.bot.idgen), ctx.guild.id, member.id, mod.id, "ban", None, reason
+        )
 
     async def apply_mute(
         self,
         ctx: Context,
         member: Member,
         reason: str,
-        expires_at: t.Optional[datetime.datetime] = None
+        expires_at: t.Optional[datetime.datetime] = None,
+        *,
+        moderator: t.Optional[Member] = None
     ):
-        async with self.bot.db.acquire() as connection:
-            check_muted = await connection.fetchrow(
-                "SELECT * FROM cases WHERE target = $1 AND expired = False AND case_type = $2",
-                member.id, "mute"
-            )
+        moderator = moderator or ctx.author
+        if await self.bot.queries.active_mute(ctx.guild.id, member.id):
+            await ctx.send("This person is already muted")
+            return
 
-            if check_muted:
-                await ctx.send("This person is already muted")
-                return
+        muted_role = await self.muted_roles.get(ctx.guild)
+        await member.add_roles(muted_role)
+        await ctx.send(embed=discord.Embed(title=f"✅ {member} was muted."))
+        await self.bot.queries.insert_case(
+            case_id := next(self.bot.idgen),
+            ctx.guild.id,
+            member.id,
+            moderator.id,
+            "mute",
+            expires_at,
+            reason,
+        )
+        if expires_at is not None:
+            self.scheduler.schedule(expires_at, case_id)
 
-            muted_role = await connection.fetchval(
-                "SELECT muted_role FROM guilds WHERE guild_id = $1", ctx.guild.id
-            )
+        return case_id
 
-            muted_role = ctx.guild.get_role(muted_role)
+    @commands.has_permissions(ban_members=True)
+    @commands.command(aliases=("mass_ban",))
+    async def massban(
+        self,
+        ctx: Context,
+        targets: commands.Greedy[discord.Object],
+        *,
+        reason: str = "No reason provided"
+    ):
+        """Bans many users at once, by mention or id. Useful for cleaning up after raids."""
+        self.check_reason(reason)
+        targets = self.filter_targets(ctx, targets)
+        if not targets:
+            return await ctx.send("Please give at least one user I'm allowed to ban.")
 
-            if not muted_role:
-                muted_permissions = discord.Permissions(
-                    send_messages=False, speak=False
-                )
+        async def ban(target: discord.Object):
+            await ctx.guild.ban(target, reason=reason, delete_message_days=1)
 
-                muted_role = await ctx.guild.create_role(
-                    name="Muted",
-                    permissions=muted_permissions,
-                    colour=0x808080,
-                    reason="New Muted role for mods.",
-                )
-                muted_role_position = next(
-                    (role.position - 1)
-                    for index, role in enumerate(ctx.guild.roles)
-                    if role.permissions.manage_members
-                    or index + 1 == len(ctx.guild.roles)
-                )
+        banned = await self.run_mass_action(ctx, "Banning", targets, ban)
+        await self.bot.queries.insert_cases(
+            ctx.guild.id, ctx.author.id, "ban", None, reason,
+            self.bot.idgen.reserve(len(banned)), [target.id for target in banned],
+        )
 
-                await muted_role.edit(position=muted_role_position)
+    @commands.has_permissions(ban_members=True)
+    @commands.command(aliases=("mass_mute",))
+    async def massmute(
+        self,
+        ctx: Context,
+        targets: commands.Greedy[Member],
+        *,
+        reason: str = "No reason provided"
+    ):
+        """Mutes many members at once. Useful for cleaning up after raids."""
+        self.check_reason(reason)
+        targets = self.filter_targets(ctx, targets)
+        already_muted = set(
+            await self.bot.queries.active_mutes(ctx.guild.id, [member.id for member in targets])
+        )
+        targets = [member for member in targets if member.id not in already_muted]
+        if not targets:
+            return await ctx.send("Please give at least one member I can mute.")
 
-                await ctx.send(embed=discord.Embed(title=f"✅ {member} was muted."))
+        muted_role = await self.muted_roles.get(ctx.guild)
 
-                await connection.execute(
-                    "INSERT INTO guilds (guild_id, muted_role) VALUES ($1, $2) "
-                    "ON CONFLICT DO UPDATE SET muted_role = $1",
-                    muted_role.id,
-                    ctx.guild.id
-                )
+        async def mute(member: Member):
+            await member.add_roles(muted_role, reason=reason)
+
+        muted = await self.run_mass_action(ctx, "Muting", targets, mute)
+        await self.bot.queries.insert_cases(
+            ctx.guild.id, ctx.author.id, "mute", None, reason,
+            self.bot.idgen.reserve(len(muted)), [member.id for member in muted],
+        )
 
-            await member.add_roles(muted_role)
-            await ctx.send(embed=discord.Embed(title=f"✅ {member} was muted."))
-            await connection.execute(
-                "INSERT INTO cases "
-                "(case_id, guild_id, target, moderator, case_type, expires_at, reason)"
-                "VALUES ($1, $2, $3, $4, $5, $6, $7)",
-                case_id := next(self.bot.idgen),
-                ctx.guild.id,
-                member.id,
-                ctx.author.id,
-                member.name,
-                ctx.author.name,
-                "mute",
-                expires_at,
-                reason,
+    @staticmethod
+    def check_reason(reason: str):
+        # The cases are only recorded once every action has run, so a reason too long to
+        # store has to be caught before any of them.
+        if len(reason) > MAX_REASON_LENGTH:
+            raise commands.BadArgument(
+                f"The reason can be at most {MAX_REASON_LENGTH} characters long."
             )
 
-            return case_id
+    @staticmethod
+    def filter_targets(ctx: Context, targets: t.List[discord.abc.Snowflake]) -> list:
+        """Drop duplicates and anyone whose top role isn't below the moderator's."""
+        unique = {target.id: target for target in targets}
+        allowed = []
+        for target in unique.values():
+            member = ctx.guild.get_member(target.id)
+            if member is not None and (
+                member == ctx.guild.owner or ctx.author.top_role <= member.top_role
+            ):
+                continue
+            allowed.append(target)
+        return allowed
+
+    async def run_mass_action(
+        self,
+        ctx: Context,
+        verb: str,
+        targets: list,
+        action: t.Callable[[t.Any], t.Awaitable[None]],
+    ) -> list:
+        """Run `action` on every target through a small pool of workers.
+
+        The number of requests in flight is capped, and requests that get rate limited or
+        hit a server error are retried with backoff. One summary embed is edited as work
+        completes. Returns the targets the action succeeded for."""
+        done, failed = [], []
+        semaphore = asyncio.Semaphore(constants.MASS_ACTION_CONCURRENCY)
+
+        embed = discord.Embed(title=f"{verb} {len(targets)} users...", colour=discord.Colour.orange())
+        message = await ctx.send(embed=embed)
+
+        def update_embed():
+            embed.clear_fields()
+            embed.add_field(name="Done", value=str(len(done)))
+            embed.add_field(name="Failed", value=str(len(failed)))
+            embed.add_field(name="Remaining", value=str(len(targets) - len(done) - len(failed)))
+
+        async def worker(target):
+            async with semaphore:
+                for attempt in range(MASS_ACTION_RETRIES):
+                    try:
+                        await action(target)
+                    except discord.HTTPException as error:
+                        if error.status != 429 and error.status < 500:
+                            break
+                        await asyncio.sleep(2 ** attempt)
+                    else:
+                        done.append(target)
+                        return
+                failed.append(target)
+
+        async def report_progress():
+            while True:
+                await asyncio.sleep(2)
+                update_embed()
+                await message.edit(embed=embed)
+
+        reporter = asyncio.create_task(report_progress())
+        try:
+            await asyncio.gather(*map(worker, targets))
+        finally:
+            reporter.cancel()
+
+        update_embed()
+        embed.title = f"✅ Finished {verb.lower()} {len(targets)} users."
+        embed.colour = discord.Colour.green() if not failed else discord.Colour.red()
+        await message.edit(embed=embed)
+        return done
+
+    @commands.has_permissions(ban_members=True)
+    @commands.command(aliases=("cases", "mod_logs"))
+    async def modlogs(self, ctx: Context, member: t.Optional[User] = None):
+        """Shows the moderation history of this server, or of a member if you give one."""
+        target = member.id if member else None
+        total = await self.bot.queries.count_cases(ctx.guild.id, target)
+        if not total:
+            return await ctx.send("No cases found.")
+
+        history = CaseHistory(self.bot.queries, ctx.guild.id, target)
+        title = f"Cases for {member}" if member else f"Cases in {ctx.guild}"
+
+        async def fetch_page(index: int) -> discord.Embed:
+            embed = discord.Embed(title=title, colour=discord.Colour.blurple())
+            for case in await history.page(index):
+                expires = f"\nExpires at: {case['expires_at']:%Y-%m-%d %H:%M} UTC" if case["expires_at"] else ""
+                embed.add_field(
+                    name=f"#{case['case_id']} {case['case_type'].title()}",
+                    value=(f"Target: <@{case['target']}>\nModerator: <@{case['moderator']}>\n"
+                           f"Reason: {case['reason']}{expires}"),
+                    inline=False,
+                )
+            return embed
+
+        view = LazyPaginatedView(ctx, -(-total // CASES_PER_PAGE), fetch_page)
+        await view.start()
 
     @commands.has_permissions(ban_members=True)
     @commands.command()
@@ -175,61 +385,80 @@ class Moderation(commands.Cog):
         if not sum(time):
             await ctx.send("Please specify a valid time")
             return
-        expires_at = datetime.datetime.now() + datetime.timedelta(seconds=sum(time))
-        ret = await self.apply_mute(ctx, member, reason, expires_at)
-        await self.preform_unmute(member, expires_at=expires_at, case_id=ret)
-
-
-    async def preform_unmute(self,
-                             member: discord.Member,
-                             *,
-                             muted_role: t.Optional[discord.Role] = None,
-                             expires_at: datetime.datetime,
-                             case_id: int
-                             ):
-        await utils.sleep_until(expires_at)
-        try:
-            if not muted_role:
-                muted_role = discord.utils.find(lambda r: r.name.lower() == 'muted', member.roles)
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=sum(time))
+        await self.apply_mute(ctx, member, reason, expires_at)
+
+    async def load_expiries(self):
+        """Schedule every case that's still waiting to expire, including ones from before a restart."""
+        await self.bot.wait_until_ready()
+        pending = await self.bot.queries.pending_expiries([guild.id for guild in self.bot.guilds])
+        self.scheduler.schedule_many((case["expires_at"], case["case_id"]) for case in pending)
+        self.scheduler.start()
+        self.sweeper.start()
+
+    async def expire_cases(self, case_ids: t.List[int]):
+        # The sweep claims everything that's due, which includes these cases.
+        await self.sweep()
+
+    @tasks.loop(seconds=constants.EXPIRY_SWEEP_INTERVAL)
+    async def sweeper(self):
+        """Catch cases the scheduler doesn't know about, like ones added by another process."""
+        await self.sweep()
+
+    async def sweep(self):
+        """Expire every due case with one query, then undo the mutes and bans concurrently.
+
+        Only cases in guilds this process is connected to are claimed; the others are
+        left for the shard that owns them."""
+        cases = await self.bot.queries.claim_expired(
+            datetime.datetime.utcnow(), [guild.id for guild in self.bot.guilds]
+        )
+        if not cases:
+            return
+
+        semaphore = asyncio.Semaphore(constants.EXPIRY_CONCURRENCY)
+
+        async def undo(case):
+            guild = self.bot.get_guild(case["guild_id"])
+            if guild is None:
+                return
+            async with semaphore:
+                try:
+                    if case["case_type"] == "mute":
+                        await self.remove_mute(guild, case["target"])
+                    elif case["case_type"] == "ban":
+                        await guild.unban(discord.Object(case["target"]))
+                except discord.HTTPException as error:
+                    log.warning(
+                        "Couldn't undo %s case %s for %s in guild %s: %s",
+                        case["case_type"], case["case_id"], case["target"], guild.id, error,
+                    )
+
+        await asyncio.gather(*map(undo, cases))
+
+    async def remove_mute(self, guild: discord.Guild, target: int):
+        member = guild.get_member(target)
+        if member is None:
+            return
+        muted_role = await self.muted_roles.get(guild, create=False)
+        if muted_role is not None:
             await member.remove_roles(muted_role)
-        except Exception:
-            pass
-        async with self.bot.db.acquire() as connection:
-            await connection.execute("UPDATE cases SET expired = 'True' WHERE id = $1", case_id)
-    
-    async def preform_unban(self, user: int, expires_at: datetime.datetime, case_id: int, guild: discord.Guild):
-        await discord.utils.sleep_until(expires_at)
-        try:
-            await guild.unban(discord.Object(user))
-        except Exception:
-            pass
 
-        async with self.bot.db.acquire() as connection:
-            await connection.execute("UPDATE cases SET expired = 'True' WHERE id = $1", case_id)
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.muted_roles.invalidate(role)
 
-    async def setup_timed_events(self):
-        await self.bot.wait_until_ready()
-        async with self.bot.db.acquire() as connection:
-            mutes = await connection.fetch(
-                "SELECT * FROM cases WHERE case_type = 'mute' AND expires_at IS NOT NULL"
-            )
-            bans = await connection.fetch(
-                "SELECT * FROM cases WHERE case_type = 'ban' AND expires_at IS NOT NULL"
-            )
-            for mute in mutes:
-                db_guild = await connection.fetchrow("SELECT * FROM guilds WHERE guild_id = $1", mute["guildid"])
-                guild = mute["guildid"]
-                guild = self.bot.get_guild(guild)
-                member = guild.get_member(mute["userid"])
-                role = guild.get_role(db_guild["muted_role"])
-                await self.preform_unmute(member, muted_role=role,
-                                          expires_at=mute["expires_at"], case_id=mute["id"])
-            for ban in bans:
-                guild = ban["guildid"]
-                guild = self.bot.get_guild(guild)
-                await self.preform_unban(ban["user"], ban["expires_at"], ban["id"], guild)
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        self.muted_roles.invalidate(after)
+
+    def cog_unload(self):
+        self.scheduler.stop()
+        self.sweeper.cancel()
 
 def setup(bot):
     bot.add_cog(Moderation(bot))
-    bot.idgen = IDGenerator()
+    # Each process needs its own worker id, fall back to the shard id when it isn't set.
+    worker_id = constants.WORKER_ID if constants.WORKER_ID is not None else bot.shard_id or 0
+    bot.idgen = IDGenerator(worker_id)
     print("Loaded cogs.Moderation")
@@ -245,6 +245,78 @@ class Owner(commands.Cog):
             )
         )
     
+    @owner.command()
+    async def stats(self, ctx: commands.Context):
+        """Shows internal counters for the bot's caches and filters."""
+        embed = discord.Embed(title="Bot Stats", colour=discord.Colour.blurple())
+        embed.add_field(
+            name="Messages Skipped",
+            value=f"`{self.bot.skipped_messages}` messages had no prefix",
+        )
+        settings = self.bot.guild_settings
+        embed.add_field(
+            name="Guild Settings Cache",
+            value=(f"`{len(settings)}` cached, `{settings.hits}` hits, `{settings.misses}` misses "
+                   f"({settings.hit_ratio:.1%} hit ratio)"),
+        )
+        pool = self.bot.db.stats
+        embed.add_field(
+            name="Database Pool",
+            value=(f"`{pool.in_use}/{self.bot.db.max_size}` in use (peak `{pool.peak_in_use}`), "
+                   f"`{pool.waiting}` waiting, `{pool.timeouts}` timeouts\n"
+                   f"Wait: `{pool.average_wait * 1000:.2f}ms` avg, `{pool.max_wait * 1000:.2f}ms` max\n"
+                   f"Hold: `{pool.average_hold * 1000:.2f}ms` avg, `{pool.max_hold * 1000:.2f}ms` max"),
+            inline=False,
+        )
+        engine = self.bot.image_engine
+        embed.add_field(
+            name="Image Engine",
+            value=(f"`{engine.pending}/{engine.max_pending}` jobs pending on "
+                   f"`{engine.max_workers}` workers, `{engine.rejected}` rejected, "
+                   f"`{engine.restarts}` restarts"),
+            inline=False,
+        )
+        cache = self.bot.image_cache
+        embed.add_field(
+            name="Image Cache",
+            value=(f"`{len(cache)}` images, `{cache.size / 1024 ** 2:.1f}MB` in memory, "
+                   f"`{cache.hits}` hits, `{cache.misses}` misses ({cache.hit_ratio:.1%} hit ratio)"),
+            inline=False,
+        )
+        if image_cog := self.bot.get_cog("Image"):
+            embed.add_field(
+                name="Image Stages",
+                value="\n".join(
+                    f"`{stage}`: {stats.calls} runs, {stats.average * 1000:.2f}ms avg, "
+                    f"{stats.max * 1000:.2f}ms max"
+                    for stage, stats in image_cog.stage_stats.items()
+                ) or "No images processed yet.",
+                inline=False,
+            )
+            embed.add_field(
+                name="Image Encoders",
+                value="\n".join(
+                    f"`{preset}`: {sizes.calls} results, "
+                    f"{image_cog.encode_stats[preset].average * 1000:.2f}ms avg encode, "
+                    f"{sizes.average / 1024:.1f}KB avg"
+                    for preset, sizes in image_cog.output_sizes.items()
+                ) or "No images encoded yet.",
+                inline=False,
+            )
+        busiest = sorted(
+            self.bot.queries.stats.items(), key=lambda item: item[1].total, reverse=True
+        )[:5]
+        embed.add_field(
+            name="Queries",
+            value="\n".join(
+                f"`{name}`: {stats.calls} calls, {stats.average * 1000:.2f}ms avg, "
+                f"{stats.max * 1000:.2f}ms max"
+                for name, stats in busiest if stats.calls
+            ) or "No queries run yet.",
+            inline=False,
+        )
+        await ctx.send(embed=embed)
+
     @owner.command()
     async def clear(self, ctx: commands.Context, limit: int):
         """
@@ -0,0 +1,109 @@
+import typing as t
+from array import array
+
+
+class RateLimit(t.NamedTuple):
+    """At most `count` events are allowed within `seconds`."""
+
+    count: int
+    seconds: float
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """Parse a rate written like `8/5`, meaning 8 events per 5 seconds."""
+        count, _, seconds = value.partition("/")
+        return cls(int(count), float(seconds))
+
+
+class SlidingWindow:
+    """Timestamps of the last `count` events, kept in a fixed size ring buffer.
+
+    The limit is hit when the oldest of those events is still inside the window,
+    so checking it never looks at more than one slot."""
+
+    __slots__ = ("times", "index")
+
+    def __init__(self, count: int):
+        self.times = array("d", [float("-inf")]) * count
+        self.index = 0
+
+    def hit(self, now: float, limit: RateLimit) -> bool:
+        """Record an event, returning whether the rate limit has been exceeded."""
+        self.times[self.index] = now
+        self.index = (self.index + 1) % len(self.times)
+        # After the write, `index` points at the oldest event we know about.
+        return self.times[self.index] > now - limit.seconds
+
+    def clear(self):
+        for index in range(len(self.times)):
+            self.times[index] = float("-inf")
+
+
+class UserActivity:
+    """Recent activity of one member in one guild."""
+
+    __slots__ = ("messages", "duplicates", "mentions", "last_content", "last_seen")
+
+    def __init__(self, limits: "SpamLimits"):
+        self.messages = SlidingWindow(limits.messages.count + 1)
+        self.duplicates = SlidingWindow(limits.duplicates.count + 1)
+        self.mentions = SlidingWindow(limits.mentions.count + 1)
+        self.last_content = 0
+        self.last_seen = 0.0
+
+
+class SpamLimits(t.NamedTuple):
+    messages: RateLimit
+    duplicates: RateLimit
+    mentions: RateLimit
+
+
+class SpamTracker:
+    """Tracks per-guild, per-member message rates and reports who goes over a limit."""
+
+    def __init__(self, limits: SpamLimits, idle_after: float = 300):
+        self.limits = limits
+        self.idle_after = idle_after
+        self.users: t.Dict[t.Tuple[int, int], UserActivity] = {}
+
+    def check(
+        self, guild_id: int, user_id: int, content: str, mentions: int, now: float
+    ) -> t.Optional[str]:
+        """Record a message, returning the reason if it broke a limit."""
+        key = (guild_id, user_id)
+        activity = self.users.get(key)
+        if activity is None:
+            activity = self.users[key] = UserActivity(self.limits)
+        activity.last_seen = now
+
+        limits = self.limits
+        reason = None
+        if activity.messages.hit(now, limits.messages):
+            reason = "Sending messages too quickly"
+
+        content_hash = hash(content)
+        if content_hash == activity.last_content and content:
+            if activity.duplicates.hit(now, limits.duplicates):
+                reason = "Sending the same message repeatedly"
+        activity.last_content = content_hash
+
+        # A mass mention counts once per mention, up to the size of the window.
+        for _ in range(min(mentions, limits.mentions.count + 1)):
+            if activity.mentions.hit(now, limits.mentions):
+                reason = "Mentioning too many users"
+
+        return reason
+
+    def reset(self, guild_id: int, user_id: int):
+        self.users.pop((guild_id, user_id), None)
+
+    def evict_idle(self, now: float) -> int:
+        """Forget members who haven't sent anything for a while, returning how many."""
+        cutoff = now - self.idle_after
+        idle = [key for key, activity in self.users.items() if activity.last_seen < cutoff]
+        for key in idle:
+            del self.users[key]
+        return len(idle)
+
+    def __len__(self):
+        return len(self.users)
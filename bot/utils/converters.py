@@ -3,10 +3,13 @@ import os
 import re
 from typing import Optional, Tuple
 
+import discord
 from discord.ext import commands
 from discord.ext.commands import Converter
 from more_itertools import chunked
 
+from bot.utils.exceptions import ImageTooLarge
+
 ESCAPE_REGEX = re.compile("[`\u202E\u200B]{3,}")
 FORMATTED_CODE_REGEX = re.compile(
     r"```(?P<lang>[a-z+]+)?\s*" r"(?P<code>.*)" r"\s*" r"```", re.DOTALL | re.IGNORECASE
@@ -52,9 +55,12 @@ class ImageConverter(Converter):
                 raise commands.BadArgument("Image must be a str, or None.")
             else:
                 if ctx.message.attachments:
-                    bytes_image = await ctx.message.attachments[0].read()
+                    attachment = ctx.message.attachments[0]
+                    if attachment.size > ctx.bot.image_fetcher.max_bytes:
+                        raise ImageTooLarge(ctx.bot.image_fetcher.max_bytes)
+                    bytes_image = await attachment.read()
                 else:
-                    bytes_image = await ctx.author.avatar_url.read()
+                    bytes_image = await self.fetch_avatar(ctx, ctx.author)
         else:
             try:
                 user = await commands.UserConverter().convert(ctx, image)
@@ -66,14 +72,19 @@ class ImageConverter(Converter):
                 except commands.MessageNotFound:
                     if recursion:
                         raise
-                    async with ctx.bot.http_session.get(image) as response:
-                        if response.status == 200:
-                            bytes_image = await response.read()
+                    bytes_image = await ctx.bot.image_fetcher.fetch(image)
             else:
-                bytes_image = user.avatar_url.read()
+                bytes_image = await self.fetch_avatar(ctx, user)
 
         return io.BytesIO(bytes_image)
 
+    @staticmethod
+    async def fetch_avatar(ctx: commands.Context, user: discord.abc.User) -> bytes:
+        # The avatar hash changes whenever the avatar does, so it's safe to cache by.
+        return await ctx.bot.image_fetcher.fetch(
+            str(user.avatar_url), key=f"avatar:{user.id}:{user.avatar}"
+        )
+
 class ExtensionConverter(Converter):
 
     @staticmethod
@@ -1,5 +1,5 @@
 import discord
-from discord.ext.commands import CheckFailure
+from discord.ext.commands import CheckFailure, CommandError
 
 class RoleHierarchyError(CheckFailure):
     def __init__(self, invoker: discord.Member, target: discord.Member):
@@ -11,4 +11,27 @@ class RoleHierarchyError(CheckFailure):
             f"Missing Permissions: {self.invoker.display_name}'s top role ({self.invoker.top_role}) "
             f"is lower than {self.target.display_name}'s top role {self.target.top_role}."
         )
-    
\ No newline at end of file
+    
+class ImageEngineBusy(CommandError):
+    def __str__(self):
+        return "I'm busy processing other images right now, try again in a moment."
+
+class FetchError(CommandError):
+    def __init__(self, url: str, status: int = None):
+        self.url = url
+        self.status = status
+
+    def __str__(self):
+        if self.status is None:
+            return "I couldn't download that image."
+        return f"I couldn't download that image, the server responded with {self.status}."
+
+class ImageTooLarge(CommandError):
+    def __init__(self, limit: int, unit: str = "bytes"):
+        self.limit = limit
+        self.unit = unit
+
+    def __str__(self):
+        if self.unit == "bytes":
+            return f"That image is too large, the limit is {self.limit / 1024 ** 2:.1f} MiB."
+        return f"That image is too large, the limit is {self.limit:,} {self.unit}."
@@ -0,0 +1,104 @@
+import asyncio
+import typing as t
+from collections import OrderedDict
+from time import monotonic
+
+import aiohttp
+
+from bot.utils.exceptions import FetchError, ImageTooLarge
+
+
+class CachedResponse:
+    __slots__ = ("data", "etag", "last_modified", "expires_at")
+
+    def __init__(self, data: bytes, etag: t.Optional[str], last_modified: t.Optional[str], ttl: float):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = monotonic() + ttl
+
+
+class ImageFetcher:
+    """Downloads images, sharing work between requests for the same thing.
+
+    Concurrent fetches of the same key wait on a single download. Finished downloads
+    are kept for `ttl` seconds, and after that we revalidate them with the server
+    using `If-None-Match`/`If-Modified-Since` where it gave us the headers to do so.
+    Keys default to the URL; avatars are keyed by their hash so a changed avatar is
+    never served from the cache.
+
+    Bodies are streamed and the download is abandoned with `ImageTooLarge` as soon as
+    it goes past `max_bytes`, whatever the server claimed in `Content-Length`."""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        ttl: float = 300,
+        max_entries: int = 256,
+        max_bytes: int = 8 * 1024 ** 2,
+    ):
+        self.session = session
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.downloads = 0
+        self.revalidations = 0
+        self._cache: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._in_flight: t.Dict[str, asyncio.Future] = {}
+
+    async def fetch(self, url: str, key: t.Optional[str] = None) -> bytes:
+        key = key or url
+        entry = self._cache.get(key)
+        if entry is not None and entry.expires_at > monotonic():
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry.data
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._download(url, key, entry))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so one caller giving up doesn't cancel the download for the others.
+        return await asyncio.shield(task)
+
+    async def _download(self, url: str, key: str, entry: t.Optional[CachedResponse]) -> bytes:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304 and entry is not None:
+                    self.revalidations += 1
+                    data = entry.data
+                elif response.status == 200:
+                    self.downloads += 1
+                    data = await self._read(response)
+                else:
+                    raise FetchError(url, response.status)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except aiohttp.ClientError:
+            raise FetchError(url)
+
+        self._cache[key] = CachedResponse(data, etag, last_modified, self.ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return data
+
+    async def _read(self, response: aiohttp.ClientResponse) -> bytes:
+        if response.content_length is not None and response.content_length > self.max_bytes:
+            raise ImageTooLarge(self.max_bytes)
+
+        data = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            data += chunk
+            if len(data) > self.max_bytes:
+                raise ImageTooLarge(self.max_bytes)
+        return bytes(data)
@@ -0,0 +1,132 @@
+"""Image filters written against NumPy arrays instead of Pillow's per-pixel built-ins.
+
+Every filter takes a Pillow image and returns an RGBA one at the same resolution,
+leaving the alpha channel alone. Arrays come from `np.asarray`, which copies the pixels
+out since Pillow only exposes them through `tobytes`, and are handed back with
+`Image.fromarray`, which wraps the array's memory rather than copying it. Where a
+filter treats the colour channels alike, it works on each pixel as one packed 32-bit
+word so the whole image is a single contiguous pass."""
+import numpy as np
+from PIL import Image
+
+
+def word(r: int, g: int, b: int, a: int) -> np.uint32:
+    """An RGBA pixel packed into a word in the machine's byte order."""
+    return np.array([r, g, b, a], dtype=np.uint8).view(np.uint32)[0]
+
+
+RGB_MASK = word(255, 255, 255, 0)
+ALPHA_MASK = word(0, 0, 0, 255)
+# Multiplying a grey level by this repeats it across the colour channels.
+GRAY = word(1, 1, 1, 0)
+# ITU-R 601 luma weights in 8-bit fixed point, so they sum to exactly 256.
+LUMA = (77, 150, 29)
+# The PICO-8 palette, a popular pixel art set.
+PALETTE = np.array(
+    [
+        (0, 0, 0), (29, 43, 83), (126, 37, 83), (0, 135, 81),
+        (171, 82, 54), (95, 87, 79), (194, 195, 199), (255, 241, 232),
+        (255, 0, 77), (255, 163, 0), (255, 236, 39), (0, 228, 54),
+        (41, 173, 255), (131, 118, 156), (255, 119, 168), (255, 204, 170),
+    ],
+    dtype=np.uint8,
+)
+# Pixels compared against the palette at once, bounding the distance matrix to a few MB.
+QUANTIZE_CHUNK = 64 * 1024
+
+
+def to_array(image: Image.Image) -> np.ndarray:
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    return np.asarray(image)
+
+
+def to_image(array: np.ndarray) -> Image.Image:
+    return Image.fromarray(array, "RGBA")
+
+
+def pixels(array: np.ndarray) -> np.ndarray:
+    """View an RGBA array as one word per pixel."""
+    return array.view(np.uint32)[..., 0]
+
+
+def from_pixels(words: np.ndarray) -> Image.Image:
+    return to_image(words.view(np.uint8).reshape(*words.shape, 4))
+
+
+def luminance(array: np.ndarray) -> np.ndarray:
+    r, g, b = (array[..., channel].astype(np.uint16) for channel in range(3))
+    return ((r * LUMA[0] + g * LUMA[1] + b * LUMA[2]) >> 8).astype(np.uint8)
+
+
+def from_gray(gray: np.ndarray, array: np.ndarray) -> Image.Image:
+    """Spread grey levels over the colour channels, keeping the original alpha."""
+    return from_pixels(gray.astype(np.uint32) * GRAY | pixels(array) & ALPHA_MASK)
+
+
+def invert(image: Image.Image) -> Image.Image:
+    """Only a baseline for `benchmarks.image_filters`; the cog keeps Pillow's invert."""
+    return from_pixels(pixels(to_array(image)) ^ RGB_MASK)
+
+
+def grayscale(image: Image.Image) -> Image.Image:
+    """Only a baseline for `benchmarks.image_filters`; Pillow's is faster, so the cog uses it."""
+    array = to_array(image)
+    return from_gray(luminance(array), array)
+
+
+def posterize(image: Image.Image, bits: int = 3) -> Image.Image:
+    level = (0xFF << (8 - bits)) & 0xFF
+    return from_pixels(pixels(to_array(image)) & word(level, level, level, 255))
+
+
+def pixelate(image: Image.Image, blocks: int = 32) -> Image.Image:
+    """Average the image over square blocks, about `blocks` of them along the longer side."""
+    array = to_array(image)
+    height, width = array.shape[:2]
+    block = max(1, max(height, width) // blocks)
+    rows, columns = height // block, width // block
+    if not rows or not columns:
+        return to_image(array)
+
+    cropped = array[:rows * block, :columns * block]
+    # Summing one axis at a time keeps each reduction over contiguous memory, which is
+    # several times faster than reducing both block axes together.
+    sums = cropped.reshape(rows, block, columns * block, 4).sum(axis=1, dtype=np.uint32)
+    sums = sums.reshape(rows, columns, block, 4).sum(axis=2)
+    means = (sums // (block * block)).astype(np.uint8)
+    out = np.repeat(np.repeat(means, block, axis=0), block, axis=1)
+    # The leftover strip on the right and bottom takes the colour of the block next to it.
+    if out.shape[:2] != (height, width):
+        out = np.pad(out, ((0, height - out.shape[0]), (0, width - out.shape[1]), (0, 0)), "edge")
+    return to_image(out)
+
+
+def quantize(image: Image.Image, palette: np.ndarray = PALETTE) -> Image.Image:
+    """Map every pixel to the nearest colour in `palette`."""
+    array = to_array(image)
+    words = pixels(array)
+    colours = palette.astype(np.float32)
+    # |c - p|^2 = |c|^2 - 2c.p + |p|^2, and |c|^2 is the same for every candidate.
+    bias = (colours ** 2).sum(axis=1)
+    packed = np.pad(palette, ((0, 0), (0, 1))).view(np.uint32)[:, 0]
+
+    flat = array[..., :3].reshape(-1, 3)
+    out = np.empty(len(flat), dtype=np.uint32)
+    for start in range(0, len(flat), QUANTIZE_CHUNK):
+        chunk = flat[start:start + QUANTIZE_CHUNK].astype(np.float32)
+        out[start:start + QUANTIZE_CHUNK] = packed[(bias - 2 * chunk @ colours.T).argmin(axis=1)]
+    return from_pixels(out.reshape(words.shape) | words & ALPHA_MASK)
+
+
+def edges(image: Image.Image) -> Image.Image:
+    """Sobel edge magnitude, light edges on a dark background."""
+    array = to_array(image)
+    p = np.pad(luminance(array).astype(np.int16), 1, mode="edge")
+    # The Sobel kernels are separable: smooth along one axis, difference along the other.
+    vertical = p[:-2] + 2 * p[1:-1] + p[2:]
+    horizontal = p[:, :-2] + 2 * p[:, 1:-1] + p[:, 2:]
+    gx = vertical[:, 2:] - vertical[:, :-2]
+    gy = horizontal[2:] - horizontal[:-2]
+    magnitude = np.minimum(np.abs(gx) + np.abs(gy), 255).astype(np.uint8)
+    return from_gray(magnitude, array)
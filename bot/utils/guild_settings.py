@@ -0,0 +1,93 @@
+import typing as t
+from collections import OrderedDict
+
+import asyncpg
+
+from .queries import Queries
+
+class GuildSettings:
+    """The settings stored in a guild's row of the `guilds` table."""
+
+    __slots__ = ("guild_id", "muted_role", "level_up_messages")
+
+    FIELDS = ("muted_role", "level_up_messages")
+
+    def __init__(
+        self,
+        guild_id: int,
+        muted_role: t.Optional[int] = None,
+        level_up_messages: bool = True,
+    ):
+        self.guild_id = guild_id
+        self.muted_role = muted_role
+        self.level_up_messages = level_up_messages
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "GuildSettings":
+        return cls(record["guild_id"], **{field: record[field] for field in cls.FIELDS})
+
+    def __repr__(self):
+        fields = " ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"<GuildSettings {fields}>"
+
+
+class GuildSettingsRepository:
+    """A read-through, write-through LRU cache of guild settings.
+
+    Reads go to the database only on a miss, and updates are written straight to the
+    database and then replace the cached entry."""
+
+    def __init__(self, queries: Queries, max_size: int = 1024):
+        self.queries = queries
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[int, GuildSettings]" = OrderedDict()
+
+    async def get(self, guild_id: int) -> GuildSettings:
+        if (settings := self._cache.get(guild_id)) is not None:
+            self._cache.move_to_end(guild_id)
+            self.hits += 1
+            return settings
+
+        self.misses += 1
+        record = await self.queries.get_guild(guild_id)
+        # Guilds without a row just have the defaults, which we cache as well.
+        settings = GuildSettings.from_record(record) if record else GuildSettings(guild_id)
+        self._store(settings)
+        return settings
+
+    async def update(self, guild_id: int, **fields) -> GuildSettings:
+        """Write the given settings to the database, creating the guild's row if needed."""
+        if unknown := set(fields) - set(GuildSettings.FIELDS):
+            raise TypeError(f"Unknown guild settings: {', '.join(unknown)}")
+        if not fields:
+            return await self.get(guild_id)
+
+        # Only the given columns are written, so a concurrent change to another setting,
+        # from here or another process, isn't overwritten with what we had cached.
+        async with self.queries.db.acquire() as connection:
+            async with connection.transaction():
+                for field, value in fields.items():
+                    setter = getattr(self.queries, f"set_{field}")
+                    record = await setter(guild_id, value, connection=connection)
+        settings = GuildSettings.from_record(record)
+        self._store(settings)
+        return settings
+
+    def invalidate(self, guild_id: int):
+        self._cache.pop(guild_id, None)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _store(self, settings: GuildSettings):
+        self._cache[settings.guild_id] = settings
+        self._cache.move_to_end(settings.guild_id)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def __len__(self):
+        return len(self._cache)
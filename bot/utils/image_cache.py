@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import os
+import threading
+import typing as t
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ImageCache:
+    """An LRU cache of processed images, keyed by the input's hash and the operation.
+
+    Entries are kept in memory up to `max_bytes`. If a directory is given, entries are
+    also written there and read back when they've fallen out of memory, with the least
+    recently used files removed once the directory grows past `disk_max_bytes`. Disk
+    access runs in a thread so it never blocks the event loop."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        directory: t.Optional[Path] = None,
+        disk_max_bytes: int = 0,
+    ):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_size = 0
+        # Writes and pruning come from several threads at once.
+        self._disk_lock = threading.Lock()
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+            self.disk_size = sum(file.stat().st_size for file in directory.iterdir())
+
+    @staticmethod
+    def key(data: bytes, operation: str, **params) -> str:
+        """Build a key from the input's contents, the operation and its parameters."""
+        digest = hashlib.sha256(data)
+        digest.update(operation.encode())
+        for name, value in sorted(params.items()):
+            digest.update(f"\0{name}={value!r}".encode())
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> t.Optional[bytes]:
+        if (data := self._entries.get(key)) is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+        if self.directory is not None:
+            if (data := await asyncio.to_thread(self._read_disk, key)) is not None:
+                self.hits += 1
+                self._store(key, data)
+                return data
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, data: bytes):
+        self._store(key, data)
+        if self.directory is not None and len(data) <= self.disk_max_bytes:
+            await asyncio.to_thread(self._write_disk, key, data)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _store(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def _read_disk(self, key: str) -> t.Optional[bytes]:
+        path = self.directory / key
+        try:
+            data = path.read_bytes()
+            # Pruning goes by modification time, so a hit marks the file as recently used.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def _write_disk(self, key: str, data: bytes):
+        path = self.directory / key
+        with self._disk_lock:
+            if path.exists():
+                return
+            # Written under another name and renamed, so a reader never sees half a file.
+            partial = path.with_suffix(".partial")
+            partial.write_bytes(data)
+            os.replace(partial, path)
+            self.disk_size += len(data)
+            self._prune_disk()
+
+    def _prune_disk(self):
+        if self.disk_size <= self.disk_max_bytes:
+            return
+        files = []
+        for file in self.directory.iterdir():
+            try:
+                files.append((file.stat(), file))
+            except FileNotFoundError:
+                pass
+        for stat, file in sorted(files, key=lambda item: item[0].st_mtime):
+            if self.disk_size <= self.disk_max_bytes:
+                break
+            try:
+                file.unlink()
+            except FileNotFoundError:
+                continue
+            self.disk_size -= stat.st_size
+
+    def __len__(self):
+        return len(self._entries)
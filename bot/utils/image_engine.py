@@ -0,0 +1,72 @@
+import asyncio
+import multiprocessing
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from bot.utils.exceptions import ImageEngineBusy
+
+T = t.TypeVar("T")
+
+
+class ImageEngine:
+    """Runs CPU heavy image work in a pool of processes, away from the event loop.
+
+    Jobs should take and return `bytes` so the only copy made is the one needed to get
+    them to and from the worker. At most `max_pending` jobs can be queued or running;
+    past that new jobs are rejected with `ImageEngineBusy` instead of piling up. If a
+    worker dies, e.g. killed for running out of memory, the pool is replaced and the
+    jobs that were in it fail with `ImageEngineBusy` too."""
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.executor: t.Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self.executor is None:
+            self.executor = self._create_executor()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # Forking copies the bot's threads' locks in whatever state they're in, which can
+        # deadlock a worker, so workers start from a fresh interpreter instead.
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(self.max_workers, mp_context=context)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    @property
+    def busy(self) -> bool:
+        """Whether every worker is occupied, so new jobs will have to queue."""
+        return self.pending >= self.max_workers
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def run(self, func: t.Callable[..., T], *args) -> T:
+        if self.executor is None:
+            raise RuntimeError("The image engine hasn't been started.")
+        if self.saturated:
+            self.rejected += 1
+            raise ImageEngineBusy()
+
+        self.pending += 1
+        executor = self.executor
+        try:
+            return await asyncio.get_event_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # Every job in the pool fails at once, but only the first replaces it.
+            if self.executor is executor:
+                executor.shutdown(wait=False)
+                self.executor = self._create_executor()
+                self.restarts += 1
+            raise ImageEngineBusy()
+        finally:
+            self.pending -= 1
@@ -0,0 +1,66 @@
+import typing as t
+from pathlib import Path
+
+import asyncpg
+
+# Any constant works, it only has to be the same for every process running migrations.
+MIGRATION_LOCK_ID = 0x626F74746F
+
+
+class Migration(t.NamedTuple):
+    version: int
+    name: str
+    path: Path
+
+
+def find_migrations(path: Path) -> t.List[Migration]:
+    """Find the numbered migration files, like `0001_initial.sql`, in a directory."""
+    migrations = []
+    for file in path.glob("*.sql"):
+        version, _, name = file.stem.partition("_")
+        migrations.append(Migration(int(version), name, file))
+    return sorted(migrations)
+
+
+async def get_schema_version(connection: asyncpg.Connection) -> int:
+    try:
+        return await connection.fetchval("SELECT coalesce(max(version), 0) FROM schema_version")
+    except asyncpg.UndefinedTableError:
+        return 0
+
+
+async def migrate(connection: asyncpg.Connection, path: Path) -> t.List[Migration]:
+    """Apply any migrations newer than the database's schema version.
+
+    When the schema is already current this is a single query. Otherwise an advisory
+    lock makes sure only one process applies migrations when several start together,
+    and each migration runs in its own transaction. Returns the migrations applied."""
+    migrations = find_migrations(path)
+    if not migrations or await get_schema_version(connection) >= migrations[-1].version:
+        return []
+
+    await connection.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+    try:
+        await connection.execute(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version integer PRIMARY KEY, "
+            "name text NOT NULL, "
+            "applied_at timestamp NOT NULL DEFAULT (now() AT TIME ZONE 'utc'))"
+        )
+        # Another process may have applied some while we waited for the lock.
+        current = await get_schema_version(connection)
+        applied = []
+        for migration in migrations:
+            if migration.version <= current:
+                continue
+            async with connection.transaction():
+                await connection.execute(migration.path.read_text())
+                await connection.execute(
+                    "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                    migration.version,
+                    migration.name,
+                )
+            applied.append(migration)
+        return applied
+    finally:
+        await connection.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
@@ -21,12 +21,20 @@ class PaginatedView(View):
 
         select: Select = self.children[-1]
 
-        for option in range(len(self.embeds)):
+        # Discord only allows 25 options in a select.
+        for option in range(min(self.page_count, 25)):
             select.add_option(label=f"Got to Page {option+1}", value=str(option))
 
+    @property
+    def page_count(self) -> int:
+        return len(self.embeds)
+
+    async def get_page(self, index: int) -> discord.Embed:
+        return self.embeds[index]
+
     async def start(self) -> None:
-        embed = self.embeds[self.current_page].copy()
-        embed.set_footer(text=f"Page number: {self.current_page+1}")
+        embed = (await self.get_page(self.current_page)).copy()
+        embed.set_footer(text=f"Page number: {self.current_page+1}/{self.page_count}")
         await self.context.send(embed=embed, view=self)
 
     async def edit_message(self, interaction: discord.Interaction) -> None:
@@ -35,8 +43,8 @@ class PaginatedView(View):
                 "You cannot interact with someone else's command!", ephemeral=True
             )
         else:
-            embed = self.embeds[self.current_page].copy()
-            embed.set_footer(text=f"Page number: {self.current_page+1}")
+            embed = (await self.get_page(self.current_page)).copy()
+            embed.set_footer(text=f"Page number: {self.current_page+1}/{self.page_count}")
             await interaction.message.edit(embed=embed)
 
     @button(emoji=Emojis.FIRST)
@@ -59,7 +67,7 @@ class PaginatedView(View):
     async def next_button(
         self, button: Button, interaction: discord.Interaction
     ) -> None:
-        if self.current_page < len(self.embeds) - 1:
+        if self.current_page < self.page_count - 1:
             self.current_page += 1
             await self.edit_message(interaction)
 
@@ -67,8 +75,8 @@ class PaginatedView(View):
     async def last_button(
         self, button: Button, interaction: discord.Interaction
     ) -> None:
-        if self.current_page < len(self.embeds) - 1:
-            self.current_page = len(self.embeds) - 1
+        if self.current_page < self.page_count - 1:
+            self.current_page = self.page_count - 1
             await self.edit_message(interaction)
 
     @button(emoji=Emojis.TRASH)
@@ -115,4 +123,29 @@ class PaginatedView(View):
                 embed1.add_field(name=field.name, value=field.value, inline=inline)
             pages.append(embed1)
 
-        return cls(ctx, pages, **options)
\ No newline at end of file
+        return cls(ctx, pages, **options)
+
+
+class LazyPaginatedView(PaginatedView):
+    """A PaginatedView that only builds each page when it's first shown."""
+
+    def __init__(
+        self,
+        ctx: commands.Context,
+        page_count: int,
+        fetch_page: t.Callable[[int], t.Awaitable[discord.Embed]],
+        timeout: t.Optional[float] = None
+    ) -> None:
+        self._page_count = page_count
+        self.fetch_page = fetch_page
+        self.pages: t.Dict[int, discord.Embed] = {}
+        super().__init__(ctx, [], timeout=timeout)
+
+    @property
+    def page_count(self) -> int:
+        return self._page_count
+
+    async def get_page(self, index: int) -> discord.Embed:
+        if index not in self.pages:
+            self.pages[index] = await self.fetch_page(index)
+        return self.pages[index]
@@ -0,0 +1,107 @@
+import asyncio
+import typing as t
+from time import perf_counter
+
+import asyncpg
+
+
+class PoolStats:
+    """Counters for how long connections are waited for and held."""
+
+    __slots__ = (
+        "acquires", "timeouts", "in_use", "peak_in_use", "waiting",
+        "total_wait", "max_wait", "total_hold", "max_hold",
+    )
+
+    def __init__(self):
+        self.acquires = self.timeouts = 0
+        self.in_use = self.peak_in_use = self.waiting = 0
+        self.total_wait = self.max_wait = 0.0
+        self.total_hold = self.max_hold = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.acquires if self.acquires else 0.0
+
+    @property
+    def average_hold(self) -> float:
+        return self.total_hold / self.acquires if self.acquires else 0.0
+
+
+class _AcquireContext:
+    """Works like asyncpg's, both awaited and as an async context manager."""
+
+    __slots__ = ("pool", "timeout", "connection")
+
+    def __init__(self, pool: "InstrumentedPool", timeout: t.Optional[float]):
+        self.pool = pool
+        self.timeout = timeout
+        self.connection = None
+
+    def __await__(self):
+        return self.pool._acquire(self.timeout).__await__()
+
+    async def __aenter__(self):
+        self.connection = await self.pool._acquire(self.timeout)
+        return self.connection
+
+    async def __aexit__(self, *exc):
+        connection, self.connection = self.connection, None
+        await self.pool.release(connection)
+
+
+class InstrumentedPool:
+    """Wraps an asyncpg pool to record acquire wait time, hold time and usage.
+
+    Anything not overridden here is passed through to the wrapped pool."""
+
+    def __init__(self, pool: asyncpg.pool.Pool, *, max_size: int, acquire_timeout: t.Optional[float] = None):
+        self.pool = pool
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.stats = PoolStats()
+        self._acquired_at: t.Dict[asyncpg.Connection, float] = {}
+
+    def __await__(self):
+        return self._initialize().__await__()
+
+    async def _initialize(self) -> "InstrumentedPool":
+        await self.pool
+        return self
+
+    def __getattr__(self, attr):
+        return getattr(self.pool, attr)
+
+    def acquire(self, *, timeout: t.Optional[float] = None) -> _AcquireContext:
+        return _AcquireContext(self, timeout if timeout is not None else self.acquire_timeout)
+
+    async def _acquire(self, timeout: t.Optional[float]) -> asyncpg.Connection:
+        stats = self.stats
+        stats.waiting += 1
+        start = perf_counter()
+        try:
+            connection = await self.pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.waiting -= 1
+
+        now = perf_counter()
+        waited = now - start
+        stats.acquires += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+        stats.in_use += 1
+        stats.peak_in_use = max(stats.peak_in_use, stats.in_use)
+        self._acquired_at[connection] = now
+        return connection
+
+    async def release(self, connection: asyncpg.Connection, *, timeout: t.Optional[float] = None):
+        acquired_at = self._acquired_at.pop(connection, None)
+        if acquired_at is not None:
+            held = perf_counter() - acquired_at
+            self.stats.total_hold += held
+            self.stats.max_hold = max(self.stats.max_hold, held)
+            self.stats.in_use -= 1
+        await self.pool.release(connection, timeout=timeout)
@@ -0,0 +1,109 @@
+import re
+import typing as t
+
+MENTION_REGEX = re.compile(r"<@!?(\d+)>")
+
+# Marks a node in the trie where a prefix ends. Characters are never empty strings.
+END = ""
+
+
+def _fold(text: str) -> t.List[str]:
+    """Lowercase a string one character at a time, so the trie walk can fold as it goes."""
+    return [char.lower() for char in text]
+
+
+class PrefixEntry:
+    """A guild's custom prefix, and whether it matches regardless of case."""
+
+    __slots__ = ("prefix", "insensitive")
+
+    def __init__(self, prefix: str, insensitive: bool = False):
+        self.prefix = prefix
+        self.insensitive = insensitive
+
+    def __repr__(self):
+        return f"<PrefixEntry prefix={self.prefix!r} insensitive={self.insensitive}>"
+
+
+class PrefixMatcher:
+    """A compiled set of prefixes for one guild.
+
+    Prefixes are stored in two character tries, one for case sensitive prefixes and
+    one keyed by lowercased characters for insensitive ones. `match` walks both tries
+    together over the start of the message, so its cost depends only on the length of
+    the longest prefix and never on how many prefixes the guild has."""
+
+    __slots__ = ("entries", "max_length", "_sensitive", "_insensitive")
+
+    def __init__(self, entries: t.Iterable[PrefixEntry] = ()):
+        self.entries: t.Dict[str, PrefixEntry] = {}
+        for entry in entries:
+            self.entries[entry.prefix] = entry
+        self.compile()
+
+    def add(self, entry: PrefixEntry):
+        self.entries[entry.prefix] = entry
+        self.compile()
+
+    def remove(self, prefix: str):
+        self.entries.pop(prefix, None)
+        self.compile()
+
+    @property
+    def default(self) -> t.Optional[str]:
+        """The first prefix the guild configured, used when a message doesn't match any."""
+        return next(iter(self.entries), None)
+
+    def compile(self):
+        self._sensitive: t.Dict[str, dict] = {}
+        self._insensitive: t.Dict[str, dict] = {}
+        self.max_length = 0
+
+        for entry in self.entries.values():
+            for prefix in self._variants(entry.prefix):
+                if entry.insensitive:
+                    self._insert(self._insensitive, _fold(prefix))
+                else:
+                    self._insert(self._sensitive, prefix)
+                self.max_length = max(self.max_length, len(prefix))
+
+    @staticmethod
+    def _variants(prefix: str) -> t.Tuple[str, ...]:
+        # Discord sends mentions as either <@id> or <@!id> depending on nicknames.
+        if match := MENTION_REGEX.match(prefix):
+            rest = prefix[match.end():]
+            return (f"<@{match[1]}>{rest}", f"<@!{match[1]}>{rest}")
+        return (prefix,)
+
+    @staticmethod
+    def _insert(root: t.Dict[str, dict], chars: t.Iterable[str]):
+        node = root
+        for char in chars:
+            node = node.setdefault(char, {})
+        node[END] = True
+
+    def match(self, content: str) -> t.Optional[str]:
+        """Return the longest prefix that `content` starts with, as it appears in `content`."""
+        sensitive = self._sensitive or None
+        insensitive = self._insensitive or None
+        length = 0
+
+        for index, char in enumerate(content[:self.max_length], 1):
+            if sensitive is not None:
+                sensitive = sensitive.get(char)
+            if insensitive is not None:
+                insensitive = insensitive.get(char.lower())
+            if sensitive is None and insensitive is None:
+                break
+            if (sensitive is not None and END in sensitive) or (
+                insensitive is not None and END in insensitive
+            ):
+                length = index
+
+        return content[:length] if length else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"<PrefixMatcher prefixes={list(self.entries)!r}>"
@@ -0,0 +1,323 @@
+import datetime
+import typing as t
+from time import perf_counter
+
+import asyncpg
+
+# Every statement the cogs run on a hot path, prepared once on each pool connection.
+STATEMENTS = {
+    "ping": "SELECT 1",
+    # guilds
+    "get_guild": "SELECT * FROM guilds WHERE guild_id = $1",
+    "ensure_guild": "INSERT INTO guilds (guild_id) VALUES ($1) ON CONFLICT DO NOTHING",
+    # One upsert per setting, so writing one never overwrites another with a stale value.
+    "set_muted_role": (
+        "INSERT INTO guilds (guild_id, muted_role) VALUES ($1, $2) "
+        "ON CONFLICT (guild_id) DO UPDATE SET muted_role = EXCLUDED.muted_role RETURNING *"
+    ),
+    "set_level_up_messages": (
+        "INSERT INTO guilds (guild_id, level_up_messages) VALUES ($1, $2) "
+        "ON CONFLICT (guild_id) DO UPDATE SET level_up_messages = EXCLUDED.level_up_messages "
+        "RETURNING *"
+    ),
+    # prefixes
+    "all_prefixes": "SELECT guild_id, prefix, insensitive FROM prefixes",
+    "guild_prefixes": "SELECT prefix, insensitive FROM prefixes WHERE guild_id = $1",
+    "count_prefixes": "SELECT count(*) FROM prefixes WHERE guild_id = $1",
+    "any_insensitive": "SELECT coalesce(bool_or(insensitive), False) FROM prefixes WHERE guild_id = $1",
+    "clear_prefixes": "DELETE FROM prefixes WHERE guild_id = $1",
+    "upsert_prefix": (
+        "INSERT INTO prefixes (guild_id, prefix, insensitive) VALUES ($1, $2, $3) "
+        "ON CONFLICT (guild_id, prefix) DO UPDATE SET insensitive = EXCLUDED.insensitive"
+    ),
+    "remove_prefix": "DELETE FROM prefixes WHERE guild_id = $1 AND prefix = $2 RETURNING prefix",
+    "set_insensitive": (
+        "WITH updated AS (UPDATE prefixes SET insensitive = $2 WHERE guild_id = $1 RETURNING 1) "
+        "SELECT count(*) FROM updated"
+    ),
+    # cases
+    "active_mute": (
+        "SELECT * FROM cases WHERE guild_id = $1 AND target = $2 AND case_type = 'mute' "
+        "AND expired = False"
+    ),
+    "expire_mutes": (
+        "UPDATE cases SET expired = True WHERE guild_id = $1 AND target = $2 "
+        "AND case_type = 'mute' AND expired = False"
+    ),
+    # Cases reference guilds, so make sure the guild has a row first.
+    "insert_case": (
+        "WITH guild AS (INSERT INTO guilds (guild_id) VALUES ($2) ON CONFLICT DO NOTHING) "
+        "INSERT INTO cases (case_id, guild_id, target, moderator, case_type, expires_at, reason) "
+        "VALUES ($1, $2, $3, $4, $5, $6, $7)"
+    ),
+    # Claims every due case at once, so concurrent sweepers never handle the same case twice.
+    # Only the guilds a process can see are claimed, so shards don't take each other's cases.
+    "claim_expired": (
+        "UPDATE cases SET expired = True "
+        "WHERE expired = False AND expires_at IS NOT NULL AND expires_at <= $1 "
+        "AND guild_id = ANY($2::bigint[]) "
+        "RETURNING case_id, guild_id, target, case_type"
+    ),
+    "insert_cases": (
+        "WITH guild AS (INSERT INTO guilds (guild_id) VALUES ($1) ON CONFLICT DO NOTHING) "
+        "INSERT INTO cases (case_id, guild_id, target, moderator, case_type, expires_at, reason) "
+        "SELECT case_id, $1, target, $2, $3, $4, $5 "
+        "FROM unnest($6::bigint[], $7::bigint[]) AS new_cases (case_id, target)"
+    ),
+    "active_mutes": (
+        "SELECT target FROM cases WHERE guild_id = $1 AND target = ANY($2::bigint[]) "
+        "AND case_type = 'mute' AND expired = False"
+    ),
+    # Case history, newest first. Pages start below a case id instead of using OFFSET.
+    "count_guild_cases": "SELECT count(*) FROM cases WHERE guild_id = $1",
+    "count_member_cases": "SELECT count(*) FROM cases WHERE guild_id = $1 AND target = $2",
+    "guild_cases_page": (
+        "SELECT * FROM cases WHERE guild_id = $1 AND case_id < $2 "
+        "ORDER BY case_id DESC LIMIT $3"
+    ),
+    "member_cases_page": (
+        "SELECT * FROM cases WHERE guild_id = $1 AND target = $2 AND case_id < $3 "
+        "ORDER BY case_id DESC LIMIT $4"
+    ),
+    # Finds where a later page starts by skipping over ids only, without fetching the rows.
+    "guild_cases_cursor": (
+        "SELECT case_id FROM cases WHERE guild_id = $1 AND case_id < $2 "
+        "ORDER BY case_id DESC OFFSET $3 LIMIT 1"
+    ),
+    "member_cases_cursor": (
+        "SELECT case_id FROM cases WHERE guild_id = $1 AND target = $2 AND case_id < $3 "
+        "ORDER BY case_id DESC OFFSET $4 LIMIT 1"
+    ),
+    "pending_expiries": (
+        "SELECT case_id, expires_at FROM cases WHERE expired = False AND expires_at IS NOT NULL "
+        "AND guild_id = ANY($1::bigint[])"
+    ),
+}
+
+
+class StatementConnection(asyncpg.Connection):
+    """A pool connection that holds the prepared statements from `STATEMENTS`."""
+
+    __slots__ = ("statements",)
+
+
+async def prepare_statements(connection: StatementConnection):
+    """Pool `init` hook, prepares every statement on a new connection."""
+    connection.statements = {
+        name: await connection.prepare(query) for name, query in STATEMENTS.items()
+    }
+
+
+class QueryStats:
+    __slots__ = ("calls", "total", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    @property
+    def average(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+class Queries:
+    """Typed access to the prepared statements, recording how long each one takes.
+
+    Every method takes an optional `connection` so several queries can share a
+    transaction; otherwise a connection is acquired from the pool for the call."""
+
+    def __init__(self, db: asyncpg.pool.Pool):
+        self.db = db
+        self.stats = {name: QueryStats() for name in STATEMENTS}
+
+    async def _run(self, name: str, method: str, *args, connection=None):
+        if connection is None:
+            async with self.db.acquire() as connection:
+                return await self._run(name, method, *args, connection=connection)
+
+        statement = connection.statements[name]
+        start = perf_counter()
+        try:
+            return await getattr(statement, method)(*args)
+        finally:
+            self.stats[name].record(perf_counter() - start)
+
+    async def ping(self, *, connection=None) -> int:
+        return await self._run("ping", "fetchval", connection=connection)
+
+    async def get_guild(self, guild_id: int, *, connection=None) -> t.Optional[asyncpg.Record]:
+        return await self._run("get_guild", "fetchrow", guild_id, connection=connection)
+
+    async def ensure_guild(self, guild_id: int, *, connection=None) -> None:
+        await self._run("ensure_guild", "fetch", guild_id, connection=connection)
+
+    async def set_muted_role(
+        self, guild_id: int, muted_role: t.Optional[int], *, connection=None
+    ) -> asyncpg.Record:
+        return await self._run(
+            "set_muted_role", "fetchrow", guild_id, muted_role, connection=connection
+        )
+
+    async def set_level_up_messages(
+        self, guild_id: int, level_up_messages: bool, *, connection=None
+    ) -> asyncpg.Record:
+        return await self._run(
+            "set_level_up_messages", "fetchrow", guild_id, level_up_messages, connection=connection
+        )
+
+    async def all_prefixes(self, *, connection=None) -> t.List[asyncpg.Record]:
+        return await self._run("all_prefixes", "fetch", connection=connection)
+
+    async def guild_prefixes(self, guild_id: int, *, connection=None) -> t.List[asyncpg.Record]:
+        return await self._run("guild_prefixes", "fetch", guild_id, connection=connection)
+
+    async def count_prefixes(self, guild_id: int, *, connection=None) -> int:
+        return await self._run("count_prefixes", "fetchval", guild_id, connection=connection)
+
+    async def any_insensitive(self, guild_id: int, *, connection=None) -> bool:
+        return await self._run("any_insensitive", "fetchval", guild_id, connection=connection)
+
+    async def clear_prefixes(self, guild_id: int, *, connection=None) -> None:
+        await self._run("clear_prefixes", "fetch", guild_id, connection=connection)
+
+    async def upsert_prefix(
+        self, guild_id: int, prefix: str, insensitive: bool, *, connection=None
+    ) -> None:
+        await self._run(
+            "upsert_prefix", "fetch", guild_id, prefix, insensitive, connection=connection
+        )
+
+    async def remove_prefix(self, guild_id: int, prefix: str, *, connection=None) -> bool:
+        """Remove a prefix, returning whether the guild had it."""
+        removed = await self._run(
+            "remove_prefix", "fetchval", guild_id, prefix, connection=connection
+        )
+        return removed is not None
+
+    async def set_insensitive(self, guild_id: int, insensitive: bool, *, connection=None) -> int:
+        """Set every prefix of a guild to (in)sensitive, returning how many were changed."""
+        return await self._run(
+            "set_insensitive", "fetchval", guild_id, insensitive, connection=connection
+        )
+
+    async def active_mute(
+        self, guild_id: int, target: int, *, connection=None
+    ) -> t.Optional[asyncpg.Record]:
+        return await self._run("active_mute", "fetchrow", guild_id, target, connection=connection)
+
+    async def expire_mutes(self, guild_id: int, target: int, *, connection=None) -> None:
+        await self._run("expire_mutes", "fetch", guild_id, target, connection=connection)
+
+    async def insert_case(
+        self,
+        case_id: int,
+        guild_id: int,
+        target: int,
+        moderator: int,
+        case_type: str,
+        expires_at: t.Optional[datetime.datetime],
+        reason: str,
+        *,
+        connection=None,
+    ) -> None:
+        await self._run(
+            "insert_case", "fetch",
+            case_id, guild_id, target, moderator, case_type, expires_at, reason,
+            connection=connection,
+        )
+
+    async def claim_expired(
+        self, now: datetime.datetime, guild_ids: t.List[int], *, connection=None
+    ) -> t.List[asyncpg.Record]:
+        """Mark every case in these guilds due by `now` as expired, returning the ones claimed."""
+        return await self._run("claim_expired", "fetch", now, guild_ids, connection=connection)
+
+    async def insert_cases(
+        self,
+        guild_id: int,
+        moderator: int,
+        case_type: str,
+        expires_at: t.Optional[datetime.datetime],
+        reason: str,
+        case_ids: t.List[int],
+        targets: t.List[int],
+        *,
+        connection=None,
+    ) -> None:
+        """Insert one case per target, all in a single statement."""
+        # unnest pads the shorter array with NULLs, which would only fail on the primary key.
+        if len(case_ids) != len(targets):
+            raise ValueError(f"Got {len(case_ids)} case ids for {len(targets)} targets.")
+        if not targets:
+            return
+        await self._run(
+            "insert_cases", "fetch",
+            guild_id, moderator, case_type, expires_at, reason, case_ids, targets,
+            connection=connection,
+        )
+
+    async def active_mutes(
+        self, guild_id: int, targets: t.List[int], *, connection=None
+    ) -> t.List[int]:
+        """Return which of the targets are currently muted in the guild."""
+        records = await self._run(
+            "active_mutes", "fetch", guild_id, targets, connection=connection
+        )
+        return [record["target"] for record in records]
+
+    async def count_cases(
+        self, guild_id: int, target: t.Optional[int] = None, *, connection=None
+    ) -> int:
+        if target is None:
+            return await self._run("count_guild_cases", "fetchval", guild_id, connection=connection)
+        return await self._run(
+            "count_member_cases", "fetchval", guild_id, target, connection=connection
+        )
+
+    async def cases_page(
+        self,
+        guild_id: int,
+        target: t.Optional[int],
+        before: int,
+        limit: int,
+        *,
+        connection=None,
+    ) -> t.List[asyncpg.Record]:
+        """Fetch up to `limit` cases with ids below `before`, newest first."""
+        if target is None:
+            return await self._run(
+                "guild_cases_page", "fetch", guild_id, before, limit, connection=connection
+            )
+        return await self._run(
+            "member_cases_page", "fetch", guild_id, target, before, limit, connection=connection
+        )
+
+    async def cases_cursor(
+        self,
+        guild_id: int,
+        target: t.Optional[int],
+        before: int,
+        skip: int,
+        *,
+        connection=None,
+    ) -> t.Optional[int]:
+        """Return the id of the case `skip` cases after the first one below `before`."""
+        if target is None:
+            return await self._run(
+                "guild_cases_cursor", "fetchval", guild_id, before, skip, connection=connection
+            )
+        return await self._run(
+            "member_cases_cursor", "fetchval", guild_id, target, before, skip,
+            connection=connection,
+        )
+
+    async def pending_expiries(
+        self, guild_ids: t.List[int], *, connection=None
+    ) -> t.List[asyncpg.Record]:
+        return await self._run("pending_expiries", "fetch", guild_ids, connection=connection)
@@ -0,0 +1,66 @@
+import asyncio
+import datetime
+import heapq
+import traceback
+import typing as t
+
+
+class ExpiryScheduler:
+    """Calls back with the ids of cases as they expire, all from a single task.
+
+    Pending expiries are kept in a min-heap of `(expires_at, case_id)`, and the task
+    only sleeps until the earliest one. Scheduling an earlier expiry wakes it up, so
+    adding cases never needs a task of its own. Times are naive UTC, like the database."""
+
+    def __init__(self, callback: t.Callable[[t.List[int]], t.Awaitable[None]]):
+        self.callback = callback
+        self._heap: t.List[t.Tuple[datetime.datetime, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: t.Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, expires_at: datetime.datetime, case_id: int):
+        heapq.heappush(self._heap, (expires_at, case_id))
+        if self._heap[0][1] == case_id:
+            self._wakeup.set()
+
+    def schedule_many(self, expiries: t.Iterable[t.Tuple[datetime.datetime, int]]):
+        self._heap.extend(expiries)
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def __len__(self):
+        return len(self._heap)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = (self._heap[0][0] - datetime.datetime.utcnow()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = datetime.datetime.utcnow()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[1])
+
+            try:
+                await self.callback(due)
+            except Exception:
+                traceback.print_exc()
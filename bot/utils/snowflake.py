@@ -0,0 +1,60 @@
+import time
+import typing as t
+
+# 2021-01-01T00:00:00Z, in milliseconds.
+EPOCH = 1609459200000
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+TIMESTAMP_SHIFT = WORKER_BITS + SEQUENCE_BITS
+
+
+class IDGenerator:
+    """Generates unique, time ordered 63 bit ids for cases.
+
+    Ids are laid out as `timestamp | worker id | sequence`, like Twitter's snowflakes.
+    Every process should have its own worker id. Up to 4096 ids can be made per
+    millisecond; past that we spin until the next millisecond. The timestamp is read
+    from the wall clock once and advanced with the monotonic clock, so changes to
+    the system clock can't make ids repeat or go backwards."""
+
+    def __init__(self, worker_id: int = 0):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"Worker id must be between 0 and {MAX_WORKER_ID}.")
+        self.worker_id = worker_id
+        self.sequence = 0
+        self.last_timestamp = -1
+        self._wall_start = time.time_ns() // 1_000_000 - EPOCH
+        self._monotonic_start = time.monotonic_ns()
+
+    def _timestamp(self) -> int:
+        return self._wall_start + (time.monotonic_ns() - self._monotonic_start) // 1_000_000
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> int:
+        return self.reserve(1)[0]
+
+    def reserve(self, count: int) -> t.List[int]:
+        """Make `count` ids at once, for actions that create many cases."""
+        ids = []
+        while count:
+            now = self._timestamp()
+            if now > self.last_timestamp:
+                self.last_timestamp = now
+                self.sequence = 0
+            elif self.sequence > MAX_SEQUENCE:
+                # Used up this millisecond, wait for the next one.
+                continue
+
+            taken = min(count, MAX_SEQUENCE + 1 - self.sequence)
+            base = (self.last_timestamp << TIMESTAMP_SHIFT) | (self.worker_id << SEQUENCE_BITS)
+            # Added rather than or-ed: a block ending at 4096 would otherwise set the
+            # lowest worker id bit instead of carrying past it.
+            ids.extend(range(base + self.sequence, base + self.sequence + taken))
+            self.sequence += taken
+            count -= taken
+        return ids
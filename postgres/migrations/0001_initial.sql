@@ -32,3 +32,4 @@ CREATE TABLE IF NOT EXISTS users (
     user_id bigint NOT NULL,
     CONSTRAINT users_pk PRIMARY KEY (user_id)
 );
+
@@ -0,0 +1,49 @@
+CREATE TABLE IF NOT EXISTS prefixes (
+    guild_id bigint NOT NULL REFERENCES guilds(guild_id) ON DELETE CASCADE,
+    prefix text NOT NULL,
+    insensitive boolean NOT NULL DEFAULT False,
+    CONSTRAINT prefixes_pk PRIMARY KEY (guild_id, prefix)
+);
+
+-- Move the old single prefix per guild into the prefixes table. Older databases
+-- got the `insensitive` column by hand, so make sure it exists before reading it.
+ALTER TABLE guilds ADD COLUMN IF NOT EXISTS insensitive boolean NOT NULL DEFAULT False;
+
+INSERT INTO prefixes (guild_id, prefix, insensitive)
+SELECT guild_id, prefix, insensitive FROM guilds WHERE prefix IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+DROP TRIGGER IF EXISTS guilds_prefix_change ON guilds;
+
+ALTER TABLE guilds
+    DROP COLUMN IF EXISTS prefix,
+    DROP COLUMN IF EXISTS insensitive,
+    DROP COLUMN IF EXISTS case_insensitive;
+
+CREATE OR REPLACE FUNCTION notify_prefix_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM pg_notify(
+            'prefix_change',
+            json_build_object(
+                'op', 'delete', 'guild_id', OLD.guild_id, 'prefix', OLD.prefix
+            )::text
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify(
+            'prefix_change',
+            json_build_object(
+                'op', 'insert', 'guild_id', NEW.guild_id,
+                'prefix', NEW.prefix, 'insensitive', NEW.insensitive
+            )::text
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS prefixes_change ON prefixes;
+CREATE TRIGGER prefixes_change
+    AFTER INSERT OR UPDATE OR DELETE ON prefixes
+    FOR EACH ROW EXECUTE PROCEDURE notify_prefix_change();
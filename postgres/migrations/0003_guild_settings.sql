@@ -0,0 +1,4 @@
+-- Columns the cogs have relied on but were never part of the schema.
+ALTER TABLE guilds
+    ADD COLUMN IF NOT EXISTS muted_role bigint,
+    ADD COLUMN IF NOT EXISTS level_up_messages boolean NOT NULL DEFAULT True;
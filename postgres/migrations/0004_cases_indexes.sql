@@ -0,0 +1,30 @@
+-- Cases used to be written without `expired`, which hides them from `expired = False`.
+UPDATE cases SET expired = False WHERE expired IS NULL;
+
+-- The old id generator wrapped its counter every 64 ids, so some cases share an id, and
+-- early cases may have none. The first copy of each id keeps it; every other copy, and
+-- every case without one, is given a new id past the largest in use so the key can go on.
+WITH copies AS (
+    SELECT ctid, case_id, row_number() OVER (PARTITION BY case_id ORDER BY ctid) AS copy
+    FROM cases
+), rekeyed AS (
+    SELECT ctid, row_number() OVER (ORDER BY ctid) AS offset_id
+    FROM copies
+    WHERE case_id IS NULL OR copy > 1
+)
+UPDATE cases
+SET case_id = (SELECT coalesce(max(case_id), 0) FROM cases) + rekeyed.offset_id
+FROM rekeyed
+WHERE cases.ctid = rekeyed.ctid;
+
+ALTER TABLE cases
+    ALTER COLUMN expired SET DEFAULT False,
+    ALTER COLUMN expired SET NOT NULL,
+    ADD CONSTRAINT cases_pk PRIMARY KEY (case_id);
+
+-- Looking up a member's cases of one type, e.g. checking for an active mute.
+CREATE INDEX IF NOT EXISTS cases_guild_target_type_idx ON cases (guild_id, target, case_type);
+
+-- Only the small set of cases still waiting to expire.
+CREATE INDEX IF NOT EXISTS cases_pending_expiry_idx ON cases (expires_at)
+    WHERE expired = False AND expires_at IS NOT NULL;
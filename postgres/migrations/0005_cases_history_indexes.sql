@@ -0,0 +1,3 @@
+-- Keyset pagination over a guild's, or a member's, case history, newest first.
+CREATE INDEX IF NOT EXISTS cases_guild_case_idx ON cases (guild_id, case_id DESC);
+CREATE INDEX IF NOT EXISTS cases_guild_target_case_idx ON cases (guild_id, target, case_id DESC);